@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional, List
+from functools import cached_property
+from typing import FrozenSet, Optional, List
 from pydantic import field_validator
 
 
@@ -12,6 +13,14 @@ class Settings(BaseSettings):
 
     # Database Configuration
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20  # Persistent connections kept in the pool
+    DB_MAX_OVERFLOW: int = 40  # Extra connections allowed during callback bursts
+    DB_POOL_RECYCLE: int = 1800  # Recycle connections after 30 minutes
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection before failing
+    DB_COMMAND_TIMEOUT: int = 60  # Seconds before a single query is aborted
+    DB_POOL_PRE_PING: bool = True  # Validate connections before checkout
+    DB_POOL_USE_LIFO: bool = True  # Reuse the most recently returned connection first
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500  # Server-side prepared statements kept per connection
 
     # Redis Configuration
     REDIS_URL: str = "redis://redis:6379/0"
@@ -51,6 +60,7 @@ class Settings(BaseSettings):
     MIN_WITHDRAWAL_STARS: int = 1  # Changed to 1 to allow any amount
     MIN_WITHDRAWAL_RUB: int = 100
     MIN_WITHDRAWAL_TON: float = 0.1  # Minimum TON withdrawal (0.1 TON)
+    STARS_REFUND_TX_LIMIT: int = 50  # Max recent star payments considered for refund
 
     # Currency Settings
     STARS_ONLY: bool = False  # DEPRECATED - Disable RUB payments, only use Telegram Stars
@@ -72,6 +82,15 @@ class Settings(BaseSettings):
         case_sensitive=True,
     )
 
+    @field_validator("DATABASE_URL")
+    @classmethod
+    def use_asyncpg_driver(cls, value: str) -> str:
+        """Force the asyncpg driver for plain PostgreSQL URLs"""
+        for prefix in ("postgresql://", "postgres://"):
+            if value.startswith(prefix):
+                return "postgresql+asyncpg://" + value[len(prefix):]
+        return value
+
     def get_admin_ids(self) -> List[int]:
         """
         Parse and return list of admin user IDs from comma-separated string
@@ -94,7 +113,12 @@ class Settings(BaseSettings):
         Returns:
             True if user is admin, False otherwise
         """
-        return user_id in self.get_admin_ids()
+        return user_id in self.admin_id_set
+
+    @cached_property
+    def admin_id_set(self) -> FrozenSet[int]:
+        """Admin user IDs parsed once for O(1) membership checks"""
+        return frozenset(self.get_admin_ids())
 
 
 settings = Settings()
@@ -1,9 +1,16 @@
-from typing import Optional, List
+import asyncio
+import time
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
-from sqlalchemy import select, update, func
+from sqlalchemy import (
+    select, insert, update, func, exists, cast, case, literal, union_all, event,
+    inspect as sa_inspect,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import Session, selectinload, joinedload, with_expression, defer, aliased
 
 from .models import (
     User, Raffle, Participant, Transaction, BotSettings, WithdrawalRequest, PayoutRequest,
@@ -21,21 +28,39 @@ async def get_or_create_user(
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
 ) -> User:
-    """Get existing user or create new one"""
-    result = await session.execute(
-        select(User).where(User.telegram_id == telegram_id)
-    )
-    user = result.scalar_one_or_none()
-
-    if not user:
-        user = User(
+    """
+    Get existing user or create new one
+
+    Insert-if-missing and lookup run as one statement. An existing row is
+    not rewritten; changed names are set on the ORM object and flushed
+    with the session.
+    """
+    inserted = (
+        pg_insert(User)
+        .values(
             telegram_id=telegram_id,
             username=username,
             first_name=first_name,
             last_name=last_name,
         )
-        session.add(user)
-        await session.flush()
+        .on_conflict_do_nothing(index_elements=[User.telegram_id])
+        .returning(*User.__table__.c)
+        .cte("inserted")
+    )
+    # Both branches see the same snapshot, so exactly one of them yields the row
+    result = await session.execute(
+        select(User).from_statement(
+            union_all(
+                select(inserted),
+                select(User.__table__).where(User.telegram_id == telegram_id),
+            )
+        )
+    )
+    user = result.scalars().first()
+
+    if not user:
+        # Inserted concurrently after this statement's snapshot was taken
+        user = await get_user_by_telegram_id(session, telegram_id)
     else:
         # Update user info if changed
         if username and user.username != username:
@@ -56,6 +81,22 @@ async def get_user_by_telegram_id(session: AsyncSession, telegram_id: int) -> Op
     return result.scalar_one_or_none()
 
 
+# Telegram ID -> users.id for admins; a user's internal ID never changes
+_admin_user_ids: Dict[int, int] = {}
+
+
+async def get_admin_user_id(session: AsyncSession, telegram_id: int) -> Optional[int]:
+    """Get internal user ID of an admin (cached in-process once found)"""
+    user_id = _admin_user_ids.get(telegram_id)
+    if user_id is None:
+        user_id = await session.scalar(
+            select(User.id).where(User.telegram_id == telegram_id)
+        )
+        if user_id is not None:
+            _admin_user_ids[telegram_id] = user_id
+    return user_id
+
+
 async def update_user_balance(
     session: AsyncSession,
     user_id: int,
@@ -78,7 +119,41 @@ async def update_user_balance(
 
 # ==================== RAFFLE OPERATIONS ====================
 
-async def create_raffle(
+# Short-lived cache of the active raffle: (monotonic timestamp, detached snapshot or None)
+_ACTIVE_RAFFLE_TTL = 5.0
+_active_raffle_cache: Optional[Tuple[float, Optional[Raffle]]] = None
+# Bumped on invalidation (after the writer commits), so a refresh whose query
+# may have read the pre-commit row isn't stored
+_active_raffle_generation = 0
+_active_raffle_refresh_lock = asyncio.Lock()
+
+
+# Session.info key set by writers; the cache is dropped once their transaction commits
+_ACTIVE_RAFFLE_CHANGED = "active_raffle_changed"
+
+
+def invalidate_active_raffle_cache() -> None:
+    """Drop cached active raffle snapshot"""
+    global _active_raffle_cache, _active_raffle_generation
+    _active_raffle_cache = None
+    _active_raffle_generation += 1
+
+
+def _mark_active_raffle_changed(session: AsyncSession) -> None:
+    """Invalidate the active raffle cache after this session's transaction commits"""
+    session.info[_ACTIVE_RAFFLE_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_active_raffle_after_commit(session: Session) -> None:
+    # Savepoint releases fire after_commit too; only the outer commit makes the change visible
+    if session.in_nested_transaction():
+        return
+    if session.info.pop(_ACTIVE_RAFFLE_CHANGED, False):
+        invalidate_active_raffle_cache()
+
+
+async def create_raffle_if_none_active(
     session: AsyncSession,
     min_participants: int,
     entry_fee_type: CurrencyType,
@@ -86,20 +161,53 @@ async def create_raffle(
     commission_percent: float,
     max_participants: Optional[int] = None,
     deadline: Optional[datetime] = None,
-) -> Raffle:
-    """Create new raffle"""
-    raffle = Raffle(
-        min_participants=min_participants,
-        max_participants=max_participants,
-        entry_fee_type=entry_fee_type,
-        entry_fee_amount=entry_fee_amount,
-        commission_percent=commission_percent,
-        deadline=deadline,
-        status=RaffleStatus.PENDING,
-    )
-    session.add(raffle)
-    await session.flush()
-    return raffle
+) -> Optional[int]:
+    """
+    Create new raffle only if there is no active or pending one
+
+    Runs a single INSERT ... SELECT ... WHERE NOT EXISTS statement, so the
+    check and the insert happen in one round-trip. NOT EXISTS alone does not
+    serialize concurrent admins; the uq_raffles_single_active partial unique
+    index rejects the second insert, which is reported as None.
+
+    Returns:
+        ID of the created raffle, or None if an active raffle already exists
+    """
+    now = datetime.utcnow()
+    values = {
+        "min_participants": min_participants,
+        "max_participants": max_participants,
+        "entry_fee_type": entry_fee_type,
+        "entry_fee_amount": entry_fee_amount,
+        "commission_percent": commission_percent,
+        "deadline": deadline,
+        "status": RaffleStatus.PENDING,
+        "created_at": now,
+        "updated_at": now,
+    }
+    columns = Raffle.__table__.c
+    no_active_raffle = ~exists().where(
+        Raffle.status.in_([RaffleStatus.PENDING, RaffleStatus.ACTIVE])
+    )
+
+    try:
+        # Savepoint keeps the session usable if the unique index rejects the insert
+        async with session.begin_nested():
+            result = await session.execute(
+                insert(Raffle)
+                .from_select(
+                    list(values),
+                    select(*[cast(value, columns[name].type) for name, value in values.items()])
+                    .where(no_active_raffle),
+                )
+                .returning(Raffle.id)
+            )
+            raffle_id = result.scalar_one_or_none()
+    except IntegrityError:
+        return None
+
+    _mark_active_raffle_changed(session)
+    return raffle_id
 
 
 async def get_active_raffle(session: AsyncSession) -> Optional[Raffle]:
@@ -112,13 +220,80 @@ async def get_active_raffle(session: AsyncSession) -> Optional[Raffle]:
     return result.scalar_one_or_none()
 
 
-async def get_raffle_by_id(session: AsyncSession, raffle_id: int) -> Optional[Raffle]:
-    """Get raffle by ID with participants"""
+async def get_active_raffle_with_participant_count(
+    session: AsyncSession,
+) -> Tuple[Optional[Raffle], int]:
+    """Get current active or pending raffle together with its participant count"""
+    participant_count = (
+        select(func.count(Participant.id))
+        .where(Participant.raffle_id == Raffle.id)
+        .scalar_subquery()
+    )
     result = await session.execute(
-        select(Raffle)
-        .options(selectinload(Raffle.participants))
-        .where(Raffle.id == raffle_id)
+        select(Raffle, participant_count)
+        .where(Raffle.status.in_([RaffleStatus.PENDING, RaffleStatus.ACTIVE]))
+        .order_by(Raffle.created_at.desc())
     )
+    row = result.one_or_none()
+    if row is None:
+        return None, 0
+    return row[0], row[1]
+
+
+def _raffle_snapshot(raffle: Raffle) -> Raffle:
+    """Transient copy of raffle column values, safe to share between sessions"""
+    return Raffle(**{
+        attr.key: getattr(raffle, attr.key)
+        for attr in sa_inspect(Raffle).column_attrs
+    })
+
+
+async def get_active_raffle_cached(session: AsyncSession) -> Optional[Raffle]:
+    """
+    Get current active raffle, reusing the one looked up within the last few seconds
+
+    Always returns a detached snapshot (cache hits don't touch the database):
+    read its columns only, don't modify it or access relationships. Writers
+    must re-load the raffle with get_raffle_by_id(..., for_update=True).
+    On expiry a single caller refreshes it; concurrent callers wait for
+    that refresh instead of issuing the same query. A refresh that overlaps
+    a committed status change in this process is returned but not cached;
+    changes committed by other processes show up within the TTL.
+    """
+    global _active_raffle_cache
+    cached = _active_raffle_cache
+    if cached is not None and time.monotonic() - cached[0] < _ACTIVE_RAFFLE_TTL:
+        return cached[1]
+
+    async with _active_raffle_refresh_lock:
+        cached = _active_raffle_cache
+        if cached is not None and time.monotonic() - cached[0] < _ACTIVE_RAFFLE_TTL:
+            return cached[1]
+
+        generation = _active_raffle_generation
+        raffle = await get_active_raffle(session)
+        snapshot = _raffle_snapshot(raffle) if raffle else None
+        if generation == _active_raffle_generation:
+            _active_raffle_cache = (time.monotonic(), snapshot)
+        return snapshot
+
+
+async def get_raffle_by_id(
+    session: AsyncSession,
+    raffle_id: int,
+    for_update: bool = False,
+) -> Optional[Raffle]:
+    """
+    Get raffle by ID (participants are not loaded)
+
+    With for_update=True the row is claimed via FOR UPDATE SKIP LOCKED:
+    returns None if another transaction already holds it.
+    """
+    query = select(Raffle).where(Raffle.id == raffle_id)
+    if for_update:
+        query = query.with_for_update(skip_locked=True)
+
+    result = await session.execute(query)
     return result.scalar_one_or_none()
 
 
@@ -140,9 +315,22 @@ async def update_raffle_status(
         raffle.finished_at = datetime.utcnow()
 
     await session.flush()
+    _mark_active_raffle_changed(session)
     return raffle
 
 
+async def cancel_active_raffle(session: AsyncSession) -> Optional[int]:
+    """Cancel current active or pending raffle in one statement, return its ID"""
+    result = await session.execute(
+        update(Raffle)
+        .where(Raffle.status.in_([RaffleStatus.PENDING, RaffleStatus.ACTIVE]))
+        .values(status=RaffleStatus.CANCELLED, updated_at=datetime.utcnow())
+        .returning(Raffle.id)
+    )
+    _mark_active_raffle_changed(session)
+    return result.scalars().first()
+
+
 async def set_raffle_winner(
     session: AsyncSession,
     raffle_id: int,
@@ -162,60 +350,179 @@ async def set_raffle_winner(
     raffle.finished_at = datetime.utcnow()
 
     await session.flush()
+    _mark_active_raffle_changed(session)
     return raffle
 
 
 # ==================== PARTICIPANT OPERATIONS ====================
 
-async def add_participant(
+# Advisory lock namespace for per-raffle joins (pg_advisory_xact_lock(class, raffle_id))
+_RAFFLE_JOIN_LOCK_CLASS = 1
+
+
+async def join_raffle_with_payment(
     session: AsyncSession,
     raffle_id: int,
     user_id: int,
-    transaction_id: Optional[int] = None,
-) -> Participant:
-    """Add participant to raffle"""
-    # Check if already participating
-    result = await session.execute(
-        select(Participant).where(
-            Participant.raffle_id == raffle_id,
-            Participant.user_id == user_id,
-        )
+    amount: float,
+    currency: CurrencyType,
+    payment_id: str,
+    description: str,
+    payment_metadata: dict,
+    transaction_hash: Optional[str] = None,
+) -> Tuple[Optional[int], int, int, RaffleStatus]:
+    """
+    Record a paid raffle entry and add the participant
+
+    Joins of one raffle are serialized by a transaction-scoped advisory
+    lock, so the membership check and participant numbering see every
+    earlier entry. The entry transaction and the participant row are then
+    written as data-modifying CTEs of a single statement, which also
+    returns the raffle's participant count, minimum and status. The
+    transaction is stored as COMPLETED, or FAILED if the raffle is no longer
+    pending/active or the user was already participating; the
+    uq_participants_raffle_user index backs the duplicate check, and an
+    entry it rejects is marked FAILED as well.
+
+    Returns (participant_number, participants_count, min_participants, raffle_status);
+    participant_number is None if the entry was rejected.
+    """
+    # Advisory rather than FOR UPDATE on the raffle row: execute_raffle claims
+    # that row with SKIP LOCKED and must not skip because a payment holds it.
+    # Taken in its own statement so the next one gets a snapshot after the wait.
+    await session.execute(
+        select(func.pg_advisory_xact_lock(_RAFFLE_JOIN_LOCK_CLASS, raffle_id))
     )
-    existing = result.scalar_one_or_none()
-    if existing:
-        raise ValueError("User already participating in this raffle")
 
-    # Get next participant number
-    count_result = await session.execute(
-        select(func.count(Participant.id)).where(Participant.raffle_id == raffle_id)
+    now = datetime.utcnow()
+    columns = Participant.__table__.c
+    already_participating = exists().where(
+        Participant.raffle_id == raffle_id,
+        Participant.user_id == user_id,
+    )
+    # The status is re-checked here: the payment may arrive after the raffle closed
+    can_join = exists().where(
+        Raffle.id == raffle_id,
+        Raffle.status.in_([RaffleStatus.PENDING, RaffleStatus.ACTIVE]),
+    ) & ~already_participating
+    existing_count = (
+        select(func.count(Participant.id))
+        .where(Participant.raffle_id == raffle_id)
+        .scalar_subquery()
     )
-    participant_number = count_result.scalar() + 1
 
-    participant = Participant(
-        raffle_id=raffle_id,
-        user_id=user_id,
-        transaction_id=transaction_id,
-        participant_number=participant_number,
+    recorded = (
+        insert(Transaction)
+        .values(
+            user_id=user_id,
+            type=TransactionType.RAFFLE_ENTRY,
+            amount=amount,
+            currency=currency,
+            payment_id=payment_id,
+            transaction_hash=transaction_hash,
+            description=description,
+            payment_metadata=payment_metadata,
+            status=cast(
+                case(
+                    (can_join, literal(TransactionStatus.COMPLETED, Transaction.status.type)),
+                    else_=literal(TransactionStatus.FAILED, Transaction.status.type),
+                ),
+                Transaction.status.type,
+            ),
+            created_at=now,
+            updated_at=now,
+        )
+        .returning(Transaction.id, Transaction.status)
+        .cte("recorded")
+    )
+    joined = (
+        pg_insert(Participant)
+        .from_select(
+            ["raffle_id", "user_id", "transaction_id", "joined_at", "participant_number"],
+            select(
+                cast(raffle_id, columns.raffle_id.type),
+                cast(user_id, columns.user_id.type),
+                recorded.c.id,
+                cast(now, columns.joined_at.type),
+                existing_count + 1,
+            ).where(can_join),
+        )
+        # No conflict target: also valid where legacy duplicates kept the index from being created
+        .on_conflict_do_nothing()
+        .returning(Participant.participant_number)
+        .cte("joined")
     )
-    session.add(participant)
-    await session.flush()
-    return participant
+
+    # CTEs share one snapshot, so the new participant is added to the count here
+    joined_count = select(func.count()).select_from(joined).scalar_subquery()
+    result = await session.execute(
+        select(
+            select(joined.c.participant_number).scalar_subquery(),
+            existing_count + joined_count,
+            Raffle.min_participants,
+            Raffle.status,
+            select(recorded.c.id).scalar_subquery(),
+            select(recorded.c.status).scalar_subquery(),
+        ).where(Raffle.id == raffle_id)
+    )
+    participant_number, participants_count, min_participants, raffle_status, tx_id, tx_status = result.one()
+
+    if participant_number is None and tx_status == TransactionStatus.COMPLETED:
+        # The CASE above ran before the conflict, so the payment has no participant row
+        await session.execute(
+            update(Transaction)
+            .where(Transaction.id == tx_id)
+            .values(status=TransactionStatus.FAILED, updated_at=datetime.utcnow())
+        )
+
+    return participant_number, participants_count, min_participants, raffle_status
 
 
 async def get_raffle_participants(
     session: AsyncSession,
     raffle_id: int,
+    limit: Optional[int] = None,
 ) -> List[Participant]:
-    """Get all participants for a raffle"""
-    result = await session.execute(
+    """Get participants for a raffle (all, or the first `limit`) with users preloaded"""
+    query = (
         select(Participant)
         .options(selectinload(Participant.user))
         .where(Participant.raffle_id == raffle_id)
         .order_by(Participant.participant_number)
     )
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = await session.execute(query)
     return list(result.scalars().all())
 
 
+async def is_user_in_raffle(
+    session: AsyncSession,
+    raffle_id: int,
+    user_id: int,
+) -> bool:
+    """Check if user participates in a raffle without loading participants"""
+    return await session.scalar(
+        select(
+            exists().where(
+                Participant.raffle_id == raffle_id,
+                Participant.user_id == user_id,
+            )
+        )
+    )
+
+
+async def count_raffle_participants(
+    session: AsyncSession,
+    raffle_id: int,
+) -> int:
+    """Count participants of a raffle without loading them"""
+    return await session.scalar(
+        select(func.count(Participant.id)).where(Participant.raffle_id == raffle_id)
+    )
+
+
 async def get_user_participations(
     session: AsyncSession,
     user_id: int,
@@ -243,6 +550,8 @@ async def create_transaction(
     payment_id: Optional[str] = None,
     description: Optional[str] = None,
     payment_metadata: Optional[dict] = None,
+    status: TransactionStatus = TransactionStatus.PENDING,
+    transaction_hash: Optional[str] = None,
 ) -> Transaction:
     """Create new transaction"""
     transaction = Transaction(
@@ -251,9 +560,10 @@ async def create_transaction(
         amount=amount,
         currency=currency,
         payment_id=payment_id,
+        transaction_hash=transaction_hash,
         description=description,
         payment_metadata=payment_metadata,
-        status=TransactionStatus.PENDING,
+        status=status,
     )
     session.add(transaction)
     await session.flush()
@@ -265,16 +575,36 @@ async def update_transaction_status(
     transaction_id: int,
     status: TransactionStatus,
 ) -> Transaction:
-    """Update transaction status"""
-    transaction = await session.get(Transaction, transaction_id)
+    """Update transaction status (single UPDATE ... RETURNING)"""
+    result = await session.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id)
+        .values(status=status)
+        .returning(Transaction)
+    )
+    transaction = result.scalar_one_or_none()
     if not transaction:
         raise ValueError(f"Transaction {transaction_id} not found")
-
-    transaction.status = status
-    await session.flush()
     return transaction
 
 
+async def get_transaction_by_payment_id(
+    session: AsyncSession,
+    payment_id: str,
+    type: TransactionType,
+) -> Optional[Transaction]:
+    """Get transaction of given type by external payment ID"""
+    result = await session.execute(
+        select(Transaction).where(
+            Transaction.type == type,
+            Transaction.payment_id == payment_id,
+        )
+        # Rows recorded before the unique index existed may be duplicated
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
 async def get_user_transactions(
     session: AsyncSession,
     user_id: int,
@@ -341,6 +671,7 @@ async def create_withdrawal_request(
         amount=amount,
         currency=currency,
         card_number=card_number,
+        card_last4=card_number[-4:] if card_number else None,
         phone_number=phone_number,
         status=WithdrawalStatus.PENDING,
     )
@@ -352,29 +683,56 @@ async def create_withdrawal_request(
 async def get_withdrawal_request(
     session: AsyncSession,
     withdrawal_id: int,
+    for_update: bool = False,
 ) -> Optional[WithdrawalRequest]:
-    """Get withdrawal request by ID"""
-    result = await session.execute(
+    """Get withdrawal request by ID (optionally locking it and its user row)"""
+    query = (
         select(WithdrawalRequest)
-        .options(selectinload(WithdrawalRequest.user))
+        .options(joinedload(WithdrawalRequest.user, innerjoin=True))
         .where(WithdrawalRequest.id == withdrawal_id)
     )
+    if for_update:
+        query = query.with_for_update()
+
+    result = await session.execute(query)
     return result.scalar_one_or_none()
 
 
 async def get_pending_withdrawals(
     session: AsyncSession,
     limit: int = 50,
-) -> List[WithdrawalRequest]:
-    """Get all pending withdrawal requests"""
-    result = await session.execute(
-        select(WithdrawalRequest)
-        .options(selectinload(WithdrawalRequest.user))
+    after_id: Optional[int] = None,
+) -> Tuple[List[WithdrawalRequest], int]:
+    """
+    Get a page of pending withdrawal requests, oldest first
+
+    Uses keyset pagination on the primary key: pass the last ID of the
+    previous page as after_id. The returned count covers all pending
+    requests from this page onwards.
+    """
+    total = func.count().over().label("total")
+    query = (
+        select(WithdrawalRequest, total)
+        .options(
+            joinedload(WithdrawalRequest.user),
+            # List view shows only the masked card, keep the full number out of it
+            defer(WithdrawalRequest.card_number),
+            with_expression(
+                WithdrawalRequest.created_at_display,
+                func.to_char(WithdrawalRequest.created_at, "DD.MM.YYYY HH24:MI"),
+            ),
+        )
         .where(WithdrawalRequest.status == WithdrawalStatus.PENDING)
-        .order_by(WithdrawalRequest.created_at)
+        .order_by(WithdrawalRequest.id)
         .limit(limit)
     )
-    return list(result.scalars().all())
+    if after_id is not None:
+        query = query.where(WithdrawalRequest.id > after_id)
+
+    result = await session.execute(query)
+    rows = result.all()
+    total_count = rows[0].total if rows else 0
+    return [row.WithdrawalRequest for row in rows], total_count
 
 
 async def get_user_withdrawals(
@@ -469,18 +827,48 @@ async def get_payout_request_by_raffle(
     session: AsyncSession,
     raffle_id: int,
 ) -> Optional[PayoutRequest]:
-    """Get payout request by raffle ID"""
+    """Get payout request by raffle ID (winner and raffle joined in the same query)"""
     result = await session.execute(
         select(PayoutRequest)
         .options(
-            selectinload(PayoutRequest.winner),
-            selectinload(PayoutRequest.raffle)
+            joinedload(PayoutRequest.winner, innerjoin=True),
+            joinedload(PayoutRequest.raffle, innerjoin=True)
         )
         .where(PayoutRequest.raffle_id == raffle_id)
     )
     return result.scalar_one_or_none()
 
 
+async def get_payout_context(
+    session: AsyncSession,
+    raffle_id: int,
+    winner_telegram_id: int,
+    admin_telegram_id: int,
+) -> Tuple[Optional[PayoutRequest], Optional[CurrencyType], Optional[User], Optional[User]]:
+    """
+    Get payout request, raffle currency, winner and admin users in one query
+
+    Only the raffle's entry_fee_type column is read, the Raffle row is not
+    loaded. Returns (payout, currency, winner, admin); payout is None if no
+    request exists for the raffle, winner/admin are None if the user is not
+    registered.
+    """
+    winner = aliased(User)
+    admin = aliased(User)
+    result = await session.execute(
+        select(PayoutRequest, Raffle.entry_fee_type, winner, admin)
+        .select_from(PayoutRequest)
+        .outerjoin(Raffle, Raffle.id == PayoutRequest.raffle_id)
+        .outerjoin(winner, winner.telegram_id == winner_telegram_id)
+        .outerjoin(admin, admin.telegram_id == admin_telegram_id)
+        .where(PayoutRequest.raffle_id == raffle_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None, None, None, None
+    return row[0], row[1], row[2], row[3]
+
+
 async def get_pending_payouts(
     session: AsyncSession,
     limit: int = 50,
@@ -506,28 +894,98 @@ async def update_payout_status(
     admin_id: Optional[int] = None,
     rejection_reason: Optional[str] = None,
 ) -> PayoutRequest:
-    """Update payout request status"""
-    payout = await session.get(PayoutRequest, payout_id)
-    if not payout:
-        raise ValueError(f"Payout request {payout_id} not found")
-
-    payout.status = status
+    """Update payout request status (single UPDATE ... RETURNING)"""
+    values = {"status": status}
 
     if status == PayoutStatus.COMPLETED:
-        payout.completed_at = datetime.utcnow()
+        values["completed_at"] = datetime.utcnow()
         if admin_id:
-            payout.completed_by = admin_id
+            values["completed_by"] = admin_id
     elif status == PayoutStatus.REJECTED:
-        payout.rejected_at = datetime.utcnow()
+        values["rejected_at"] = datetime.utcnow()
         if admin_id:
-            payout.rejected_by = admin_id
+            values["rejected_by"] = admin_id
         if rejection_reason:
-            payout.rejection_reason = rejection_reason
+            values["rejection_reason"] = rejection_reason
 
-    await session.flush()
+    result = await session.execute(
+        update(PayoutRequest)
+        .where(PayoutRequest.id == payout_id)
+        .values(**values)
+        .returning(PayoutRequest)
+    )
+    payout = result.scalar_one_or_none()
+    if not payout:
+        raise ValueError(f"Payout request {payout_id} not found")
     return payout
 
 
+async def complete_payout(
+    session: AsyncSession,
+    payout: PayoutRequest,
+    winner: User,
+    amount: float,
+    currency: CurrencyType,
+    payment_id: str,
+    payment_metadata: dict,
+    admin_id: Optional[int] = None,
+) -> float:
+    """
+    Credit prize to winner, record the win transaction and complete payout
+
+    All three writes run as data-modifying CTEs of a single statement
+    (one round-trip). Returns the winner's new balance in the payout
+    currency; the passed ORM objects are not refreshed.
+    """
+    now = datetime.utcnow()
+    if currency == CurrencyType.STARS:
+        balance_column = User.balance_stars
+        credit = int(amount)
+    else:
+        balance_column = User.balance_rub
+        credit = amount
+
+    credited = (
+        update(User)
+        .where(User.id == winner.id)
+        .values({balance_column: balance_column + credit, User.updated_at: now})
+        .returning(balance_column.label("balance"))
+        .cte("credited")
+    )
+    recorded = (
+        insert(Transaction)
+        .values(
+            user_id=winner.id,
+            type=TransactionType.RAFFLE_WIN,
+            amount=amount,
+            currency=currency,
+            payment_id=payment_id,
+            description=f"Приз за победу в розыгрыше #{payout.raffle_id}",
+            payment_metadata=payment_metadata,
+            status=TransactionStatus.PENDING,
+            created_at=now,
+            updated_at=now,
+        )
+        .returning(Transaction.id)
+        .cte("recorded")
+    )
+    payout_values = {"status": PayoutStatus.COMPLETED, "completed_at": now}
+    if admin_id:
+        payout_values["completed_by"] = admin_id
+    completed = (
+        update(PayoutRequest)
+        .where(PayoutRequest.id == payout.id)
+        .values(**payout_values)
+        .returning(PayoutRequest.id)
+        .cte("completed")
+    )
+
+    result = await session.execute(
+        select(credited.c.balance).add_cte(recorded).add_cte(completed)
+    )
+    return result.scalar_one()
+
+
 # ==================== TON CONNECT OPERATIONS ====================
 
 async def create_ton_connect_session(
@@ -573,6 +1031,34 @@ async def get_active_ton_connect_session(
     return result.scalar_one_or_none()
 
 
+async def get_ton_payment_state(
+    session: AsyncSession,
+    raffle_id: int,
+    user_id: int,
+) -> Tuple[bool, Optional[TonConnectSession]]:
+    """
+    Get whether user already participates in raffle and their active
+    TON Connect session, in a single query
+    """
+    in_raffle = exists().where(
+        Participant.raffle_id == raffle_id,
+        Participant.user_id == user_id,
+    )
+    result = await session.execute(
+        select(in_raffle.label("in_raffle"), TonConnectSession)
+        .select_from(User)
+        .outerjoin(
+            TonConnectSession,
+            (TonConnectSession.user_id == User.id) & (TonConnectSession.is_active == True),
+        )
+        .where(User.id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return False, None
+    return row[0], row[1]
+
+
 async def update_ton_connect_session(
     session: AsyncSession,
     session_id: int,
@@ -617,3 +1103,20 @@ async def get_ton_connect_session_by_wallet(
         .where(TonConnectSession.is_active == True)
     )
     return result.scalar_one_or_none()
+
+
+# ==================== STATISTICS OPERATIONS ====================
+
+async def get_bot_stats(session: AsyncSession) -> tuple[int, int, int]:
+    """Get users, raffles and finished raffles counts in a single query"""
+    result = await session.execute(
+        select(
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(Raffle.id)).scalar_subquery(),
+            select(func.count(Raffle.id))
+            .where(Raffle.status == RaffleStatus.FINISHED)
+            .scalar_subquery(),
+        )
+    )
+    users_count, raffles_count, finished_raffles = result.one()
+    return users_count, raffles_count, finished_raffles
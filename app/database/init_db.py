@@ -184,6 +184,77 @@ async def ensure_enums_updated(engine: AsyncEngine):
         raise
 
 
+async def ensure_columns_updated(engine: AsyncEngine):
+    """
+    Add columns and indexes introduced after initial release to existing tables
+
+    create_all() doesn't alter existing tables, so they are added here
+    (idempotent, safe to run on every startup)
+    """
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "ALTER TABLE withdrawal_requests ADD COLUMN IF NOT EXISTS card_last4 VARCHAR(4)"
+            ))
+            await conn.execute(text("""
+                UPDATE withdrawal_requests
+                SET card_last4 = RIGHT(card_number, 4)
+                WHERE card_number IS NOT NULL AND card_last4 IS NULL
+            """))
+        logger.success("✅ Table columns are up to date")
+    except Exception as e:
+        logger.error(f"Failed to update table columns: {e}", exc_info=True)
+        raise
+
+    # Separate transaction: fails if duplicates were already recorded,
+    # which must not block startup
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_type_payment_id "
+                "ON transactions (type, payment_id) "
+                "WHERE type IN ('raffle_entry', 'raffle_win')"
+            ))
+    except Exception as e:
+        logger.warning(
+            f"Could not create unique payment index (duplicate transactions exist?): {e}"
+        )
+
+    # Same for one participation per user and raffle; the plain index it
+    # supersedes is kept for membership lookups if duplicates block it
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_participants_raffle_user "
+                "ON participants (raffle_id, user_id)"
+            ))
+            await conn.execute(text("DROP INDEX IF EXISTS ix_participants_raffle_user"))
+    except Exception as e:
+        logger.warning(
+            f"Could not create unique participant index (duplicate participants exist?): {e}"
+        )
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_participants_raffle_user "
+                "ON participants (raffle_id, user_id)"
+            ))
+
+    # Same for the single active raffle guard (several active raffles may exist)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_raffles_single_active "
+                "ON raffles ((1)) "
+                "WHERE status IN ('pending', 'active')"
+            ))
+    except Exception as e:
+        logger.warning(
+            f"Could not create single active raffle index (several active raffles exist?): {e}"
+        )
+
+    return True
+
+
 async def drop_all(engine: AsyncEngine):
     """
     Drop all tables and enums (USE WITH CAUTION!)
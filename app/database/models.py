@@ -2,10 +2,10 @@ from datetime import datetime
 from enum import Enum as PyEnum
 from sqlalchemy import (
     Column, Integer, String, BigInteger, Float, DateTime,
-    ForeignKey, Enum, Boolean, Text, JSON
+    ForeignKey, Enum, Boolean, Text, JSON, Index, text
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, query_expression
 
 Base = declarative_base()
 
@@ -77,6 +77,14 @@ class User(Base):
 
 class Raffle(Base):
     __tablename__ = "raffles"
+    __table_args__ = (
+        # At most one pending/active raffle at a time (constant expression index)
+        Index(
+            "uq_raffles_single_active", text("(1)"),
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'active')"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     min_participants = Column(Integer, nullable=False)
@@ -101,6 +109,10 @@ class Raffle(Base):
 
 class Participant(Base):
     __tablename__ = "participants"
+    __table_args__ = (
+        # A user joins a raffle once; also serves membership lookups
+        Index("uq_participants_raffle_user", "raffle_id", "user_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     raffle_id = Column(Integer, ForeignKey("raffles.id"), nullable=False)
@@ -117,6 +129,14 @@ class Participant(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # A Telegram charge can credit an entry/prize only once (redelivered updates)
+        Index(
+            "uq_transactions_type_payment_id", "type", "payment_id",
+            unique=True,
+            postgresql_where=text("type IN ('raffle_entry', 'raffle_win')"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -157,6 +177,7 @@ class WithdrawalRequest(Base):
 
     # Payment details (for RUB withdrawals)
     card_number = Column(String, nullable=True)  # Bank card number
+    card_last4 = Column(String(4), nullable=True)  # Last 4 card digits for masked display
     phone_number = Column(String, nullable=True)  # Phone for SBP
     wallet_address = Column(String(48), nullable=True)  # TON wallet address for TON withdrawals
 
@@ -172,6 +193,9 @@ class WithdrawalRequest(Base):
     processed_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
+    # Formatted created_at computed by the DB (populated only by queries that request it)
+    created_at_display = query_expression()
+
     # Relationships
     user = relationship("User", foreign_keys=[user_id], backref="withdrawal_requests")
     admin = relationship("User", foreign_keys=[admin_id])
@@ -2,16 +2,30 @@ from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import NullPool
 
 from app.config import settings
 
 
-# Create async engine
+# Create async engine with a persistent connection pool (asyncpg driver)
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.LOG_LEVEL == "DEBUG",
-    poolclass=NullPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # Bursty callbacks keep reusing a few warm connections; the rest sit idle
+    pool_use_lifo=settings.DB_POOL_USE_LIFO,
+    connect_args={
+        # Short OLTP queries don't benefit from JIT compilation;
+        # application_name makes bot connections visible in pg_stat_activity
+        "server_settings": {"jit": "off", "application_name": "raffle-bot"},
+        "command_timeout": settings.DB_COMMAND_TIMEOUT,
+        # Reuse server-side prepared statements for repeated queries
+        # (SQL compilation itself is already cached by the engine)
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+    },
 )
 
 # Create async session factory
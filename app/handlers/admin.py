@@ -1,21 +1,89 @@
-from aiogram import Router, F, Bot
+import asyncio
+import re
+import weakref
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Router, F, Bot
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, TelegramObject, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from loguru import logger
+from sqlalchemy import select, desc
 
 from app.database.session import get_session
 from app.database import crud
-from app.database.models import CurrencyType, RaffleStatus, WithdrawalStatus, Transaction, TransactionStatus, PayoutStatus
+from app.database.models import (
+    CurrencyType, RaffleStatus, WithdrawalStatus, Transaction, TransactionType, TransactionStatus, PayoutStatus
+)
 from app.config import settings
-from app.keyboards.inline import admin_menu, confirm_raffle_start, back_button, admin_withdrawal_keyboard
+from app.keyboards.inline import (
+    admin_menu, confirm_raffle_start, back_button, admin_withdrawal_keyboard,
+    AdminWithdrawalCallback, AdminWithdrawalsPage, AdminPayoutCallback,
+)
 from app.handlers.raffle import execute_raffle
-from app.utils import format_currency_amount, format_user_display_name
+from app.utils import (
+    calculate_prize_pool, format_currency_amount, format_prize_amount, format_user_display_name,
+    payout_lock, spawn_background,
+)
 from app.services.payment_service import yookassa_service, PaymentError
+from app.services.notification import get_notification_service
+from app.services.stars_service import create_stars_service
 
 router = Router()
 
+# Per-raffle locks to prevent double execution on concurrent admin clicks;
+# an entry goes away once nothing holds its lock
+_raffle_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+# Pending withdrawals shown per admin list page
+_WITHDRAWALS_PAGE_SIZE = 5
+
+# Telegram Stars payments can be refunded within this window
+_REFUND_WINDOW = timedelta(days=21)
+
+# Static admin texts (built once at import time)
+_ADMIN_HEADER = "<b>🔧 Админ-панель</b>\n\nВыберите действие:"
+_NO_ACTIVE = "Нет активного розыгрыша."
+_ACCESS_DENIED = "Доступ запрещен"
+_ALREADY_ACTIVE = "Уже есть активный розыгрыш! Завершите его перед созданием нового."
+
+# Static keyboards (immutable, built once and reused across events)
+_ADMIN_MENU_MARKUP = admin_menu()
+_CONFIRM_START_MARKUP = confirm_raffle_start()
+
+# Current raffle card, filled via format_map with per-currency formatted amounts
+_RAFFLE_TEMPLATE = (
+    "<b>📊 Текущий розыгрыш #{id}</b>\n\n"
+    "Статус: {status}\n"
+    "Участников: {count}/{min}\n"
+    "Взнос: {entry_fee} {currency}\n\n"
+    "💰 Собрано: {total} {currency}\n"
+    "💸 Комиссия: {commission} {currency}\n"
+    "🏆 Приз: {prize} {currency}\n"
+)
+# Display formatter per currency, at the precision calculate_prize_pool works in
+_AMOUNT_FORMATTERS = {
+    CurrencyType.STARS: lambda v: str(int(v)),
+    CurrencyType.RUB: lambda v: f"{v:.2f}",
+    CurrencyType.TON: lambda v: f"{v:.4f}",
+}
+_CURRENCY_NAMES = {
+    CurrencyType.STARS: "⭐",
+    CurrencyType.RUB: "₽",
+    CurrencyType.TON: "TON",
+}
+
+# Admin currency choice -> (currency, entry fee, commission %, symbol)
+_ENTRY_FEE_TABLE = {
+    "stars": (CurrencyType.STARS, settings.STARS_ENTRY_FEE, settings.STARS_COMMISSION_PERCENT, "⭐"),
+    "rub": (CurrencyType.RUB, settings.RUB_ENTRY_FEE, settings.RUB_COMMISSION_PERCENT, "₽"),
+    "ton": (CurrencyType.TON, settings.TON_ENTRY_FEE, settings.TON_COMMISSION_PERCENT, "TON"),
+}
+
 
 class AdminStates(StatesGroup):
     """States for admin operations"""
@@ -24,38 +92,101 @@ class AdminStates(StatesGroup):
     waiting_for_commission = State()
 
 
+@lru_cache(maxsize=1024)
 def is_admin(user_id: int) -> bool:
-    """Check if user is admin"""
+    """Check if user is admin (cached per user ID)"""
     return settings.is_admin(user_id)
 
 
+def clear_admin_cache() -> None:
+    """Invalidate cached admin checks (call after admin list reload)"""
+    is_admin.cache_clear()
+
+
+class AdminOnlyMiddleware(BaseMiddleware):
+    """Reject non-admin updates once before any admin handler runs"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        # Resolved once per update; handlers can declare an `is_admin: bool` argument
+        data["is_admin"] = is_admin(event.from_user.id)
+        if data["is_admin"]:
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            await event.answer(_ACCESS_DENIED, show_alert=True)
+        elif isinstance(event, Message) and event.text and event.text.startswith("/admin"):
+            await event.answer("У вас нет доступа к админ-панели.")
+        return None
+
+
+# Inner middlewares only run after a handler's filters matched, so updates
+# meant for other routers are never touched
+router.message.middleware(AdminOnlyMiddleware())
+router.callback_query.middleware(AdminOnlyMiddleware())
+
+
+def _build_settings_text() -> str:
+    """Build settings summary (values come from .env and never change at runtime)"""
+    # Determine active payment method
+    active_currency = "TON 💎" if settings.TON_ONLY else ("Stars ⭐" if settings.STARS_ONLY else "Все валюты")
+
+    settings_text = (
+        "<b>⚙️ Настройки бота</b>\n\n"
+        f"💰 <b>Активная валюта:</b> {active_currency}\n\n"
+    )
+
+    if settings.TON_ONLY or not (settings.STARS_ONLY):
+        settings_text += (
+            f"💎 <b>TON:</b>\n"
+            f"  • Взнос: {settings.TON_ENTRY_FEE} TON\n"
+            f"  • Комиссия: {settings.TON_COMMISSION_PERCENT}%\n\n"
+        )
+
+    if settings.STARS_ONLY or not settings.TON_ONLY:
+        settings_text += (
+            f"⭐ <b>Stars:</b>\n"
+            f"  • Взнос: {settings.STARS_ENTRY_FEE} ⭐\n"
+            f"  • Комиссия: {settings.STARS_COMMISSION_PERCENT}%\n\n"
+        )
+
+    if not settings.TON_ONLY and not settings.STARS_ONLY:
+        settings_text += (
+            f"💳 <b>RUB:</b>\n"
+            f"  • Взнос: {settings.RUB_ENTRY_FEE} ₽\n"
+            f"  • Комиссия: {settings.RUB_COMMISSION_PERCENT}%\n\n"
+        )
+
+    settings_text += (
+        f"👥 Минимум участников: {settings.MIN_PARTICIPANTS}\n"
+        f"🔒 Показывать username: {'Да' if settings.SHOW_USERNAMES else 'Нет'}\n\n"
+        f"Для изменения настроек отредактируйте .env файл"
+    )
+    return settings_text
+
+
+_SETTINGS_TEXT = _build_settings_text()
+
+
 @router.message(Command("admin"))
 async def cmd_admin(message: Message):
     """Handle /admin command"""
-    if not is_admin(message.from_user.id):
-        await message.answer("У вас нет доступа к админ-панели.")
-        return
-
     await message.answer(
-        "<b>🔧 Админ-панель</b>\n\n"
-        "Выберите действие:",
-        reply_markup=admin_menu(),
-        parse_mode="HTML"
+        _ADMIN_HEADER,
+        reply_markup=_ADMIN_MENU_MARKUP
     )
 
 
 @router.callback_query(F.data == "admin_menu")
 async def callback_admin_menu(callback: CallbackQuery):
     """Show admin menu"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
     await callback.message.edit_text(
-        "<b>🔧 Админ-панель</b>\n\n"
-        "Выберите действие:",
-        reply_markup=admin_menu(),
-        parse_mode="HTML"
+        _ADMIN_HEADER,
+        reply_markup=_ADMIN_MENU_MARKUP
     )
     await callback.answer()
 
@@ -63,24 +194,11 @@ async def callback_admin_menu(callback: CallbackQuery):
 @router.callback_query(F.data == "admin_create_raffle")
 async def callback_admin_create_raffle(callback: CallbackQuery, state: FSMContext):
     """Start raffle creation process"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
-    # Check if there's already an active raffle
-    async with get_session() as session:
-        active_raffle = await crud.get_active_raffle(session)
-        if active_raffle:
-            await callback.answer(
-                "Уже есть активный розыгрыш! Завершите его перед созданием нового.",
-                show_alert=True
-            )
-            return
-
+    # "One active raffle" is checked on insert and backed by a unique index
+    # (see create_raffle_if_none_active)
     await callback.message.edit_text(
         "<b>📝 Создание нового розыгрыша</b>\n\n"
-        "Введите минимальное количество участников:",
-        parse_mode="HTML"
+        "Введите минимальное количество участников:"
     )
     await state.set_state(AdminStates.waiting_for_min_participants)
     await callback.answer()
@@ -89,110 +207,99 @@ async def callback_admin_create_raffle(callback: CallbackQuery, state: FSMContex
 @router.message(AdminStates.waiting_for_min_participants)
 async def process_min_participants(message: Message, state: FSMContext):
     """Process minimum participants input"""
-    if not is_admin(message.from_user.id):
+    # Bounded digit check instead of parsing arbitrary input
+    text = (message.text or "").strip()
+    if not (text.isdecimal() and len(text) <= 6):
+        await message.answer("Пожалуйста, введите число (до 6 цифр)!")
         return
 
-    try:
-        min_participants = int(message.text)
-        if min_participants < 2:
-            await message.answer("Минимум должно быть хотя бы 2 участника!")
-            return
+    min_participants = int(text)
+    if min_participants < 2:
+        await message.answer("Минимум должно быть хотя бы 2 участника!")
+        return
 
-        await state.update_data(min_participants=min_participants)
-
-        # Determine which currency to use based on config
-        currency_type = None
-        entry_fee = None
-        commission = None
-        currency_symbol = None
-
-        # Priority: TON_ONLY > STARS_ONLY > ask user
-        if settings.TON_ONLY:
-            # Automatically use TON
-            currency_type = CurrencyType.TON
-            entry_fee = settings.TON_ENTRY_FEE
-            commission = settings.TON_COMMISSION_PERCENT
-            currency_symbol = "TON"
-        elif settings.STARS_ONLY:
-            # Automatically use STARS
-            currency_type = CurrencyType.STARS
-            entry_fee = settings.STARS_ENTRY_FEE
-            commission = settings.STARS_COMMISSION_PERCENT
-            currency_symbol = "⭐"
-        else:
-            # Ask user to choose between stars and rub
-            await message.answer(
-                f"✅ Минимум участников: {min_participants}\n\n"
-                "Теперь выберите тип валюты для взноса:\n"
-                "Отправьте 'stars' для звезд или 'rub' для рублей",
-            )
-            await state.set_state(AdminStates.waiting_for_entry_fee)
-            return
+    await state.update_data(min_participants=min_participants)
+
+    # Determine which currency to use based on config
+    currency_type = None
+    entry_fee = None
+    commission = None
+    currency_symbol = None
 
-        # Auto-selected currency - create raffle immediately
-        await state.update_data(
-            currency_type=currency_type,
-            entry_fee=entry_fee,
-            commission=commission
+    # Priority: TON_ONLY > STARS_ONLY > ask user
+    if settings.TON_ONLY:
+        # Automatically use TON
+        currency_type = CurrencyType.TON
+        entry_fee = settings.TON_ENTRY_FEE
+        commission = settings.TON_COMMISSION_PERCENT
+        currency_symbol = "TON"
+    elif settings.STARS_ONLY:
+        # Automatically use STARS
+        currency_type = CurrencyType.STARS
+        entry_fee = settings.STARS_ENTRY_FEE
+        commission = settings.STARS_COMMISSION_PERCENT
+        currency_symbol = "⭐"
+    else:
+        # Ask user to choose the entry fee currency
+        await message.answer(
+            f"✅ Минимум участников: {min_participants}\n\n"
+            "Теперь выберите тип валюты для взноса:\n"
+            "Отправьте 'stars' для звезд, 'rub' для рублей или 'ton' для TON",
         )
+        await state.set_state(AdminStates.waiting_for_entry_fee)
+        return
 
-        data = await state.get_data()
+    # Auto-selected currency - create raffle immediately
+    await state.update_data(
+        currency_type=currency_type,
+        entry_fee=entry_fee,
+        commission=commission
+    )
 
-        async with get_session() as session:
-            raffle = await crud.create_raffle(
-                session,
-                min_participants=data["min_participants"],
-                entry_fee_type=currency_type,
-                entry_fee_amount=entry_fee,
-                commission_percent=commission,
-            )
+    data = await state.get_data()
+
+    async with get_session() as session:
+        raffle_id = await crud.create_raffle_if_none_active(
+            session,
+            min_participants=data["min_participants"],
+            entry_fee_type=currency_type,
+            entry_fee_amount=entry_fee,
+            commission_percent=commission,
+        )
 
+        if raffle_id is None:
             await message.answer(
-                f"✅ <b>Розыгрыш создан!</b>\n\n"
-                f"ID: #{raffle.id}\n"
-                f"Минимум участников: {data['min_participants']}\n"
-                f"Взнос: {entry_fee} {currency_symbol}\n"
-                f"Комиссия: {commission}%\n\n"
-                f"Розыгрыш активирован и готов к приему участников!",
-                reply_markup=admin_menu(),
-                parse_mode="HTML"
+                _ALREADY_ACTIVE,
+                reply_markup=_ADMIN_MENU_MARKUP
             )
+            await state.clear()
+            return
 
-            logger.info(f"Admin created raffle #{raffle.id} with {currency_type.value}")
+        await message.answer(
+            f"✅ <b>Розыгрыш создан!</b>\n\n"
+            f"ID: #{raffle_id}\n"
+            f"Минимум участников: {data['min_participants']}\n"
+            f"Взнос: {entry_fee} {currency_symbol}\n"
+            f"Комиссия: {commission}%\n\n"
+            f"Розыгрыш активирован и готов к приему участников!",
+            reply_markup=_ADMIN_MENU_MARKUP
+        )
 
-        await state.clear()
+        logger.info(f"Admin created raffle #{raffle_id} with {currency_type.value}")
 
-    except ValueError:
-        await message.answer("Пожалуйста, введите число!")
+    await state.clear()
 
 
 @router.message(AdminStates.waiting_for_entry_fee)
 async def process_entry_fee(message: Message, state: FSMContext):
     """Process entry fee type"""
-    if not is_admin(message.from_user.id):
-        return
-
-    currency_text = message.text.lower().strip()
-
-    if currency_text == "stars":
-        currency_type = CurrencyType.STARS
-        entry_fee = settings.STARS_ENTRY_FEE
-        commission = settings.STARS_COMMISSION_PERCENT
-        currency_symbol = "⭐"
-    elif currency_text == "rub":
-        currency_type = CurrencyType.RUB
-        entry_fee = settings.RUB_ENTRY_FEE
-        commission = settings.RUB_COMMISSION_PERCENT
-        currency_symbol = "₽"
-    elif currency_text == "ton":
-        currency_type = CurrencyType.TON
-        entry_fee = settings.TON_ENTRY_FEE
-        commission = settings.TON_COMMISSION_PERCENT
-        currency_symbol = "TON"
-    else:
+    row = _ENTRY_FEE_TABLE.get((message.text or "").lower().strip())
+    if row is None:
         await message.answer("Введите 'stars', 'rub' или 'ton'")
         return
 
+    currency_type, entry_fee, commission, currency_symbol = row
+
     await state.update_data(
         currency_type=currency_type,
         entry_fee=entry_fee,
@@ -203,7 +310,7 @@ async def process_entry_fee(message: Message, state: FSMContext):
     data = await state.get_data()
 
     async with get_session() as session:
-        raffle = await crud.create_raffle(
+        raffle_id = await crud.create_raffle_if_none_active(
             session,
             min_participants=data["min_participants"],
             entry_fee_type=currency_type,
@@ -211,18 +318,25 @@ async def process_entry_fee(message: Message, state: FSMContext):
             commission_percent=commission,
         )
 
+        if raffle_id is None:
+            await message.answer(
+                _ALREADY_ACTIVE,
+                reply_markup=_ADMIN_MENU_MARKUP
+            )
+            await state.clear()
+            return
+
         await message.answer(
             f"✅ <b>Розыгрыш создан!</b>\n\n"
-            f"ID: #{raffle.id}\n"
+            f"ID: #{raffle_id}\n"
             f"Минимум участников: {data['min_participants']}\n"
             f"Взнос: {entry_fee} {currency_symbol}\n"
             f"Комиссия: {commission}%\n\n"
             f"Розыгрыш активирован и готов к приему участников!",
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
+            reply_markup=_ADMIN_MENU_MARKUP
         )
 
-        logger.info(f"Admin created raffle #{raffle.id} with {currency_type.value}")
+        logger.info(f"Admin created raffle #{raffle_id} with {currency_type.value}")
 
     await state.clear()
 
@@ -230,96 +344,58 @@ async def process_entry_fee(message: Message, state: FSMContext):
 @router.callback_query(F.data == "admin_current_raffle")
 async def callback_admin_current_raffle(callback: CallbackQuery):
     """Show current raffle info for admin"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
+    # Dismiss the spinner before the DB work below
+    await callback.answer()
 
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle, participants_count = await crud.get_active_raffle_with_participant_count(session)
 
         if not raffle:
             await callback.message.edit_text(
-                "Нет активного розыгрыша.",
-                reply_markup=admin_menu(),
-                parse_mode="HTML"
+                _NO_ACTIVE,
+                reply_markup=_ADMIN_MENU_MARKUP
             )
-            await callback.answer()
             return
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-        participants_count = len(participants)
-
-        # Calculate with accurate arithmetic
-        total_collected = raffle.entry_fee_amount * participants_count
-
-        # For stars, use integer arithmetic; for TON/RUB, use proper rounding
-        if raffle.entry_fee_type == CurrencyType.STARS:
-            commission = int(total_collected * raffle.commission_percent / 100)
-            prize_pool = int(total_collected) - commission
-        else:
-            commission = round(total_collected * (raffle.commission_percent / 100), 2)
-            prize_pool = round(total_collected - commission, 2)
-
-        # Set currency symbol
-        if raffle.entry_fee_type == CurrencyType.STARS:
-            currency_name = "⭐"
-        elif raffle.entry_fee_type == CurrencyType.TON:
-            currency_name = "TON"
-        else:
-            currency_name = "₽"
-
-        # Format amounts based on currency type
-        if raffle.entry_fee_type == CurrencyType.STARS:
-            entry_fee_str = f"{int(raffle.entry_fee_amount)}"
-            total_str = f"{int(total_collected)}"
-            commission_str = f"{int(commission)}"
-            prize_str = f"{int(prize_pool)}"
-        else:
-            entry_fee_str = f"{raffle.entry_fee_amount:.2f}"
-            total_str = f"{total_collected:.2f}"
-            commission_str = f"{commission:.2f}"
-            prize_str = f"{prize_pool:.2f}"
-
-        raffle_text = (
-            f"<b>📊 Текущий розыгрыш #{raffle.id}</b>\n\n"
-            f"Статус: {raffle.status.value}\n"
-            f"Участников: {participants_count}/{raffle.min_participants}\n"
-            f"Взнос: {entry_fee_str} {currency_name}\n\n"
-            f"💰 Собрано: {total_str} {currency_name}\n"
-            f"💸 Комиссия: {commission_str} {currency_name}\n"
-            f"🏆 Приз: {prize_str} {currency_name}\n"
+        # Same calculation as execute_raffle, so the card shows the prize that is paid
+        total_collected, commission, prize_pool = calculate_prize_pool(
+            raffle.entry_fee_amount, participants_count, raffle.commission_percent, raffle.entry_fee_type
         )
+        fmt = _AMOUNT_FORMATTERS[raffle.entry_fee_type]
+
+        raffle_text = _RAFFLE_TEMPLATE.format_map({
+            "id": raffle.id,
+            "status": raffle.status.value,
+            "count": participants_count,
+            "min": raffle.min_participants,
+            "currency": _CURRENCY_NAMES[raffle.entry_fee_type],
+            "entry_fee": fmt(raffle.entry_fee_amount),
+            "total": fmt(total_collected),
+            "commission": fmt(commission),
+            "prize": fmt(prize_pool),
+        })
 
         await callback.message.edit_text(
             raffle_text,
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
+            reply_markup=_ADMIN_MENU_MARKUP
         )
 
-    await callback.answer()
-
 
 @router.callback_query(F.data == "admin_start_raffle")
 async def callback_admin_start_raffle(callback: CallbackQuery):
     """Force start raffle"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle, participants_count = await crud.get_active_raffle_with_participant_count(session)
 
         if not raffle:
-            await callback.answer("Нет активного розыгрыша", show_alert=True)
+            await callback.answer(_NO_ACTIVE, show_alert=True)
             return
 
         if raffle.status != RaffleStatus.PENDING:
             await callback.answer("Розыгрыш уже запущен или завершен", show_alert=True)
             return
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-
-        if len(participants) < 2:
+        if participants_count < 2:
             await callback.answer(
                 "Нужно хотя бы 2 участника для розыгрыша!",
                 show_alert=True
@@ -329,10 +405,9 @@ async def callback_admin_start_raffle(callback: CallbackQuery):
         await callback.message.edit_text(
             f"<b>⚠️ Принудительный запуск розыгрыша</b>\n\n"
             f"Розыгрыш #{raffle.id}\n"
-            f"Участников: {len(participants)}\n\n"
+            f"Участников: {participants_count}\n\n"
             f"Подтвердите запуск:",
-            reply_markup=confirm_raffle_start(),
-            parse_mode="HTML"
+            reply_markup=_CONFIRM_START_MARKUP
         )
 
     await callback.answer()
@@ -341,79 +416,78 @@ async def callback_admin_start_raffle(callback: CallbackQuery):
 @router.callback_query(F.data == "admin_confirm_start")
 async def callback_admin_confirm_start(callback: CallbackQuery):
     """Confirm and execute raffle"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
 
-        if not raffle or raffle.status != RaffleStatus.PENDING:
-            await callback.answer("Розыгрыш недоступен для запуска", show_alert=True)
-            return
+    if not raffle or raffle.status != RaffleStatus.PENDING:
+        await callback.answer("Розыгрыш недоступен для запуска", show_alert=True)
+        return
 
-    await callback.message.edit_text(
-        "⏳ Запускаем розыгрыш...",
-        parse_mode="HTML"
-    )
+    # Second click while the raffle is being executed - return immediately
+    lock = _raffle_locks.setdefault(raffle.id, asyncio.Lock())
+    if lock.locked():
+        await callback.answer("⏳ Розыгрыш уже запускается", show_alert=True)
+        return
 
-    # Execute raffle
-    bot = callback.bot
-    await execute_raffle(bot, raffle.id)
+    # Take the lock here (no await in between the check and acquire) and hand
+    # it over to the background task, which releases it when done
+    await lock.acquire()
+    try:
+        await callback.message.edit_text(
+            "⏳ Розыгрыш запущен в фоне. Результат появится здесь после определения победителя.",
+            reply_markup=_ADMIN_MENU_MARKUP
+        )
+        await callback.answer()
+    finally:
+        # Started after the edit so the final result can't be overwritten by it
+        spawn_background(_run_raffle_in_background(callback, raffle.id, lock))
 
-    await callback.message.edit_text(
-        "✅ Розыгрыш завершен! Победитель определен.",
-        reply_markup=admin_menu(),
-        parse_mode="HTML"
-    )
 
-    await callback.answer()
+async def _run_raffle_in_background(callback: CallbackQuery, raffle_id: int, lock: asyncio.Lock):
+    """Execute raffle outside the update handler and report the result to the admin"""
+    try:
+        # execute_raffle re-validates the status itself, no second fetch needed
+        executed = await execute_raffle(callback.bot, raffle_id)
+    except Exception as e:
+        logger.error(f"Background execution of raffle {raffle_id} failed: {e}", exc_info=True)
+        executed = False
+    finally:
+        lock.release()
+
+    text = "✅ Розыгрыш завершен! Победитель определен." if executed else "Розыгрыш недоступен для запуска"
+    try:
+        await callback.message.edit_text(text, reply_markup=_ADMIN_MENU_MARKUP)
+    except Exception as e:
+        logger.warning(f"Failed to report raffle {raffle_id} result to admin: {e}")
 
 
 @router.callback_query(F.data == "admin_stop_raffle")
 async def callback_admin_stop_raffle(callback: CallbackQuery):
     """Stop/cancel current raffle"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
-
-        if not raffle:
-            await callback.answer("Нет активного розыгрыша", show_alert=True)
-            return
-
-        await crud.update_raffle_status(session, raffle.id, RaffleStatus.CANCELLED)
+        raffle_id = await crud.cancel_active_raffle(session)
 
-        await callback.message.edit_text(
-            f"❌ Розыгрыш #{raffle.id} остановлен",
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
-        )
-
-        logger.info(f"Admin cancelled raffle #{raffle.id}")
+    if raffle_id is None:
+        await callback.answer(_NO_ACTIVE, show_alert=True)
+        return
 
+    # Report only after the cancellation has committed
+    logger.info(f"Admin cancelled raffle #{raffle_id}")
+    await callback.message.edit_text(
+        f"❌ Розыгрыш #{raffle_id} остановлен",
+        reply_markup=_ADMIN_MENU_MARKUP
+    )
     await callback.answer()
 
 
 @router.callback_query(F.data == "admin_stats")
 async def callback_admin_stats(callback: CallbackQuery):
     """Show bot statistics"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
+    # Dismiss the spinner before the DB work below
+    await callback.answer()
 
     async with get_session() as session:
-        # Get total users
-        from sqlalchemy import select, func
-        from app.database.models import User, Raffle, Transaction
-
-        users_count = await session.scalar(select(func.count(User.id)))
-        raffles_count = await session.scalar(select(func.count(Raffle.id)))
-        finished_raffles = await session.scalar(
-            select(func.count(Raffle.id)).where(Raffle.status == RaffleStatus.FINISHED)
-        )
+        users_count, raffles_count, finished_raffles = await crud.get_bot_stats(session)
 
         stats_text = (
             "<b>📊 Статистика бота</b>\n\n"
@@ -424,144 +498,112 @@ async def callback_admin_stats(callback: CallbackQuery):
 
         await callback.message.edit_text(
             stats_text,
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
+            reply_markup=_ADMIN_MENU_MARKUP
         )
 
-    await callback.answer()
-
 
 @router.callback_query(F.data == "admin_settings")
 async def callback_admin_settings(callback: CallbackQuery):
     """Show bot settings"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
-    # Determine active payment method
-    active_currency = "TON 💎" if settings.TON_ONLY else ("Stars ⭐" if settings.STARS_ONLY else "Все валюты")
-
-    settings_text = (
-        "<b>⚙️ Настройки бота</b>\n\n"
-        f"💰 <b>Активная валюта:</b> {active_currency}\n\n"
-    )
-
-    if settings.TON_ONLY or not (settings.STARS_ONLY):
-        settings_text += (
-            f"💎 <b>TON:</b>\n"
-            f"  • Взнос: {settings.TON_ENTRY_FEE} TON\n"
-            f"  • Комиссия: {settings.TON_COMMISSION_PERCENT}%\n\n"
-        )
-
-    if settings.STARS_ONLY or not settings.TON_ONLY:
-        settings_text += (
-            f"⭐ <b>Stars:</b>\n"
-            f"  • Взнос: {settings.STARS_ENTRY_FEE} ⭐\n"
-            f"  • Комиссия: {settings.STARS_COMMISSION_PERCENT}%\n\n"
-        )
-
-    if not settings.TON_ONLY and not settings.STARS_ONLY:
-        settings_text += (
-            f"💳 <b>RUB:</b>\n"
-            f"  • Взнос: {settings.RUB_ENTRY_FEE} ₽\n"
-            f"  • Комиссия: {settings.RUB_COMMISSION_PERCENT}%\n\n"
-        )
-
-    settings_text += (
-        f"👥 Минимум участников: {settings.MIN_PARTICIPANTS}\n"
-        f"🔒 Показывать username: {'Да' if settings.SHOW_USERNAMES else 'Нет'}\n\n"
-        f"Для изменения настроек отредактируйте .env файл"
-    )
-
     await callback.message.edit_text(
-        settings_text,
-        reply_markup=admin_menu(),
-        parse_mode="HTML"
+        _SETTINGS_TEXT,
+        reply_markup=_ADMIN_MENU_MARKUP
     )
 
     await callback.answer()
 
 
 @router.callback_query(F.data == "admin_withdrawals")
-async def callback_admin_withdrawals(callback: CallbackQuery):
-    """Show pending withdrawal requests"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
+@router.callback_query(AdminWithdrawalsPage.filter())
+async def callback_admin_withdrawals(
+    callback: CallbackQuery,
+    callback_data: Optional[AdminWithdrawalsPage] = None,
+):
+    """Show pending withdrawal requests (paginated)"""
+    # Dismiss the spinner before the DB work below
+    await callback.answer()
+    after_id = callback_data.after_id if callback_data else None
 
     async with get_session() as session:
-        pending_withdrawals = await crud.get_pending_withdrawals(session, limit=10)
+        pending_withdrawals, total_pending = await crud.get_pending_withdrawals(
+            session, limit=_WITHDRAWALS_PAGE_SIZE, after_id=after_id
+        )
+
+        # Everything past the cursor was processed meanwhile - start over
+        if not pending_withdrawals and after_id is not None:
+            after_id = None
+            pending_withdrawals, total_pending = await crud.get_pending_withdrawals(
+                session, limit=_WITHDRAWALS_PAGE_SIZE
+            )
 
         if not pending_withdrawals:
             await callback.message.edit_text(
                 "<b>💸 Заявки на вывод</b>\n\n"
                 "Нет ожидающих заявок",
-                reply_markup=admin_menu(),
-                parse_mode="HTML"
+                reply_markup=_ADMIN_MENU_MARKUP
             )
-            await callback.answer()
             return
 
-        withdrawals_text = "<b>💸 Заявки на вывод (ожидают)</b>\n\n"
-
-        for w in pending_withdrawals[:5]:  # Show first 5
-            user_display = format_user_display_name(w.user, show_username=True)
-
-            withdrawals_text += f"ID: #{w.id}\n"
-            withdrawals_text += f"Пользователь: {user_display}\n"
-            withdrawals_text += f"Сумма: {format_currency_amount(w.amount, w.currency)}\n"
+        parts = ["<b>💸 Заявки на вывод (ожидают)</b>\n\n"]
 
+        for w in pending_withdrawals:
             # Show payment details
-            if w.card_number:
-                masked_card = f"**** **** **** {w.card_number[-4:]}"
-                withdrawals_text += f"💳 Карта: {masked_card}\n"
+            if w.card_last4:
+                details = f"💳 Карта: **** **** **** {w.card_last4}\n"
             elif w.phone_number:
-                withdrawals_text += f"📱 Телефон: {w.phone_number}\n"
+                details = f"📱 Телефон: {w.phone_number}\n"
             else:
-                withdrawals_text += "⭐ Telegram Stars\n"
-
-            withdrawals_text += f"Дата: {w.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+                details = "⭐ Telegram Stars\n"
+
+            parts.append(
+                f"ID: #{w.id}\n"
+                f"Пользователь: {format_user_display_name(w.user, show_username=True)}\n"
+                f"Сумма: {format_currency_amount(w.amount, w.currency)}\n"
+                f"{details}"
+                f"Дата: {w.created_at_display}\n\n"
+            )
 
-        if len(pending_withdrawals) > 5:
-            withdrawals_text += f"... и еще {len(pending_withdrawals) - 5} заявок\n\n"
+        if total_pending > len(pending_withdrawals):
+            parts.append(f"... и еще {total_pending - len(pending_withdrawals)} заявок\n\n")
 
-        withdrawals_text += "Нажмите ID заявки для просмотра деталей"
+        parts.append("Нажмите ID заявки для просмотра деталей")
+        withdrawals_text = "".join(parts)
 
         # Create keyboard with withdrawal IDs
-        from aiogram.utils.keyboard import InlineKeyboardBuilder
-        from aiogram.types import InlineKeyboardButton
-
         builder = InlineKeyboardBuilder()
 
-        for w in pending_withdrawals[:5]:
+        for w in pending_withdrawals:
             builder.row(
                 InlineKeyboardButton(
                     text=f"Заявка #{w.id}",
-                    callback_data=f"admin_view_withdrawal_{w.id}"
+                    callback_data=AdminWithdrawalCallback(action="view", withdrawal_id=w.id).pack()
                 )
             )
 
+        nav = []
+        if after_id is not None:
+            nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data="admin_withdrawals"))
+        if total_pending > len(pending_withdrawals):
+            nav.append(InlineKeyboardButton(
+                text="Далее ▶️",
+                callback_data=AdminWithdrawalsPage(after_id=pending_withdrawals[-1].id).pack()
+            ))
+        if nav:
+            builder.row(*nav)
+
         builder.row(
             InlineKeyboardButton(text="◀️ Назад", callback_data="admin_menu")
         )
 
         await callback.message.edit_text(
             withdrawals_text,
-            reply_markup=builder.as_markup(),
-            parse_mode="HTML"
+            reply_markup=builder.as_markup()
         )
 
-    await callback.answer()
-
 
-@router.callback_query(F.data.startswith("admin_view_withdrawal_"))
-async def callback_admin_view_withdrawal(callback: CallbackQuery):
+async def callback_admin_view_withdrawal(callback: CallbackQuery, callback_data: AdminWithdrawalCallback):
     """View specific withdrawal request"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
-    withdrawal_id = int(callback.data.split("_")[-1])
+    withdrawal_id = callback_data.withdrawal_id
 
     async with get_session() as session:
         withdrawal = await crud.get_withdrawal_request(session, withdrawal_id)
@@ -570,51 +612,48 @@ async def callback_admin_view_withdrawal(callback: CallbackQuery):
             await callback.answer("Заявка не найдена", show_alert=True)
             return
 
-        user_display = format_user_display_name(withdrawal.user, show_username=True)
-
-        withdrawal_text = f"<b>💸 Заявка на вывод #{withdrawal.id}</b>\n\n"
-        withdrawal_text += f"Пользователь: {user_display}\n"
-        withdrawal_text += f"User ID: {withdrawal.user.telegram_id}\n"
-        withdrawal_text += f"Сумма: {format_currency_amount(withdrawal.amount, withdrawal.currency)}\n"
-        withdrawal_text += f"Статус: {withdrawal.status.value}\n\n"
+        user = withdrawal.user
 
         # Show payment details
         if withdrawal.card_number:
-            withdrawal_text += f"💳 <b>Карта:</b> {withdrawal.card_number}\n"
+            details = f"💳 <b>Карта:</b> {withdrawal.card_number}\n"
         elif withdrawal.phone_number:
-            withdrawal_text += f"📱 <b>Телефон:</b> {withdrawal.phone_number}\n"
+            details = f"📱 <b>Телефон:</b> {withdrawal.phone_number}\n"
         else:
-            withdrawal_text += "⭐ <b>Telegram Stars</b>\n"
-
-        withdrawal_text += f"\nДата создания: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}"
+            details = "⭐ <b>Telegram Stars</b>\n"
 
         # Show current balance
-        user = withdrawal.user
         if withdrawal.currency == CurrencyType.STARS:
-            withdrawal_text += f"\n\nТекущий баланс: {int(user.balance_stars)} ⭐"
+            balance = f"{int(user.balance_stars)} ⭐"
         else:
-            withdrawal_text += f"\n\nТекущий баланс: {int(user.balance_rub)} ₽"
+            balance = f"{int(user.balance_rub)} ₽"
+
+        withdrawal_text = "".join([
+            f"<b>💸 Заявка на вывод #{withdrawal.id}</b>\n\n",
+            f"Пользователь: {format_user_display_name(user, show_username=True)}\n",
+            f"User ID: {user.telegram_id}\n",
+            f"Сумма: {format_currency_amount(withdrawal.amount, withdrawal.currency)}\n",
+            f"Статус: {withdrawal.status.value}\n\n",
+            details,
+            f"\nДата создания: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}",
+            f"\n\nТекущий баланс: {balance}",
+        ])
 
         await callback.message.edit_text(
             withdrawal_text,
-            reply_markup=admin_withdrawal_keyboard(withdrawal.id),
-            parse_mode="HTML"
+            reply_markup=admin_withdrawal_keyboard(withdrawal.id)
         )
 
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_approve_withdrawal_"))
-async def callback_admin_approve_withdrawal(callback: CallbackQuery):
+async def callback_admin_approve_withdrawal(callback: CallbackQuery, callback_data: AdminWithdrawalCallback):
     """Approve withdrawal request"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
-    withdrawal_id = int(callback.data.split("_")[-1])
+    withdrawal_id = callback_data.withdrawal_id
 
     async with get_session() as session:
-        withdrawal = await crud.get_withdrawal_request(session, withdrawal_id)
+        # Lock the request and user row until commit to serialize concurrent decisions
+        withdrawal = await crud.get_withdrawal_request(session, withdrawal_id, for_update=True)
 
         if not withdrawal:
             await callback.answer("Заявка не найдена", show_alert=True)
@@ -636,15 +675,15 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
             )
             return
 
-        # Get admin user for admin_id
-        admin_user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
+        # Get admin's internal user ID
+        admin_user_id = await crud.get_admin_user_id(session, callback.from_user.id)
 
         # Update withdrawal status
         await crud.update_withdrawal_status(
             session,
             withdrawal_id=withdrawal.id,
             status=WithdrawalStatus.APPROVED,
-            admin_id=admin_user.id if admin_user else None
+            admin_id=admin_user_id
         )
 
         # Deduct from user balance
@@ -665,15 +704,18 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
 
         if withdrawal.currency == CurrencyType.STARS:
             # Get ALL eligible star transactions for refund (within 21 days)
-            from app.database.models import TransactionType
-            from sqlalchemy import select, desc
-            from datetime import datetime, timedelta
-
             # Find all star payments within refund window (21 days)
-            refund_cutoff = datetime.utcnow() - timedelta(days=21)
+            # created_at columns are naive UTC, so compare against a naive UTC cutoff
+            refund_cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - _REFUND_WINDOW
 
+            # Only the columns the refund logic reads, newest payments first
             star_transactions_result = await session.execute(
-                select(Transaction)
+                select(
+                    Transaction.id,
+                    Transaction.payment_id,
+                    Transaction.amount,
+                    Transaction.created_at,
+                )
                 .where(
                     Transaction.user_id == user.id,
                     Transaction.currency == CurrencyType.STARS,
@@ -683,13 +725,13 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
                     Transaction.created_at >= refund_cutoff
                 )
                 .order_by(desc(Transaction.created_at))
+                .limit(settings.STARS_REFUND_TX_LIMIT)
             )
-            star_transactions = star_transactions_result.scalars().all()
+            star_transactions = star_transactions_result.all()
 
             if star_transactions:
                 # Try to refund using multiple transactions
                 try:
-                    from app.services.stars_service import create_stars_service
                     stars_service = create_stars_service(callback.bot)
 
                     refund_result = await stars_service.process_withdrawal_with_multiple_refunds(
@@ -769,9 +811,7 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
                 )
 
         # Notify user
-        from app.services.notification import NotificationService
-        bot = callback.bot
-        notification_service = NotificationService(bot)
+        notification_service = get_notification_service(callback.bot)
 
         user_message = (
             f"✅ <b>Заявка на вывод одобрена!</b>\n\n"
@@ -802,11 +842,20 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
         else:
             user_message += "💳 Средства будут переведены на указанные реквизиты в течение 1-3 рабочих дней."
 
-        await notification_service.send_to_user(
-            user.telegram_id,
-            user_message
+        # Notify the user in the background; it doesn't depend on the writes below
+        spawn_background(notification_service.send_to_user(user.telegram_id, user_message))
+
+        response_text = (
+            f"✅ <b>Заявка #{withdrawal.id} одобрена!</b>\n\n"
+            f"Сумма {format_currency_amount(withdrawal.amount, withdrawal.currency)} "
+            f"списана с баланса пользователя.\n\n"
         )
 
+        if admin_note:
+            response_text += f"{admin_note}\n\n"
+
+        response_text += "Пользователь уведомлен."
+
         # Save refund information to withdrawal metadata
         if withdrawal.currency == CurrencyType.STARS and total_refunded > 0:
             withdrawal.payment_metadata = {
@@ -818,21 +867,10 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
             }
             await session.commit()
 
-        response_text = (
-            f"✅ <b>Заявка #{withdrawal.id} одобрена!</b>\n\n"
-            f"Сумма {format_currency_amount(withdrawal.amount, withdrawal.currency)} "
-            f"списана с баланса пользователя.\n\n"
-        )
-
-        if admin_note:
-            response_text += f"{admin_note}\n\n"
-
-        response_text += "Пользователь уведомлен."
-
+        # Report approval only once everything is committed
         await callback.message.edit_text(
             response_text,
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
+            reply_markup=_ADMIN_MENU_MARKUP
         )
 
         logger.info(
@@ -844,17 +882,13 @@ async def callback_admin_approve_withdrawal(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_reject_withdrawal_"))
-async def callback_admin_reject_withdrawal(callback: CallbackQuery, state: FSMContext):
+async def callback_admin_reject_withdrawal(callback: CallbackQuery, callback_data: AdminWithdrawalCallback):
     """Reject withdrawal request"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("Доступ запрещен", show_alert=True)
-        return
-
-    withdrawal_id = int(callback.data.split("_")[-1])
+    withdrawal_id = callback_data.withdrawal_id
 
     async with get_session() as session:
-        withdrawal = await crud.get_withdrawal_request(session, withdrawal_id)
+        # Lock the request and user row until commit to serialize concurrent decisions
+        withdrawal = await crud.get_withdrawal_request(session, withdrawal_id, for_update=True)
 
         if not withdrawal:
             await callback.answer("Заявка не найдена", show_alert=True)
@@ -864,24 +898,22 @@ async def callback_admin_reject_withdrawal(callback: CallbackQuery, state: FSMCo
             await callback.answer("Заявка уже обработана", show_alert=True)
             return
 
-        # Get admin user for admin_id
-        admin_user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
+        # Get admin's internal user ID
+        admin_user_id = await crud.get_admin_user_id(session, callback.from_user.id)
 
         # Update withdrawal status
         await crud.update_withdrawal_status(
             session,
             withdrawal_id=withdrawal.id,
             status=WithdrawalStatus.REJECTED,
-            admin_id=admin_user.id if admin_user else None,
+            admin_id=admin_user_id,
             rejection_reason="Отклонено администратором"
         )
 
         await session.commit()
 
         # Notify user
-        from app.services.notification import NotificationService
-        bot = callback.bot
-        notification_service = NotificationService(bot)
+        notification_service = get_notification_service(callback.bot)
 
         user = withdrawal.user
         user_message = (
@@ -892,16 +924,13 @@ async def callback_admin_reject_withdrawal(callback: CallbackQuery, state: FSMCo
             f"Средства остались на вашем балансе."
         )
 
-        await notification_service.send_to_user(
-            user.telegram_id,
-            user_message
-        )
+        # Notify the user in the background; the admin only waits for the edit
+        spawn_background(notification_service.send_to_user(user.telegram_id, user_message))
 
         await callback.message.edit_text(
             f"❌ <b>Заявка #{withdrawal.id} отклонена</b>\n\n"
             f"Пользователь уведомлен.",
-            reply_markup=admin_menu(),
-            parse_mode="HTML"
+            reply_markup=_ADMIN_MENU_MARKUP
         )
 
         logger.info(
@@ -911,24 +940,39 @@ async def callback_admin_reject_withdrawal(callback: CallbackQuery, state: FSMCo
     await callback.answer()
 
 
+_WITHDRAWAL_ACTIONS = {
+    "view": callback_admin_view_withdrawal,
+    "approve": callback_admin_approve_withdrawal,
+    "reject": callback_admin_reject_withdrawal,
+}
+
+
+@router.callback_query(AdminWithdrawalCallback.filter(F.action.in_(_WITHDRAWAL_ACTIONS)))
+async def callback_admin_withdrawal_action(callback: CallbackQuery, callback_data: AdminWithdrawalCallback):
+    """Dispatch withdrawal view/approve/reject with a single filter check"""
+    await _WITHDRAWAL_ACTIONS[callback_data.action](callback, callback_data)
+
+
+@router.callback_query(F.data.regexp(r"^admin_(view|approve|reject)_withdrawal_(\d+)$").as_("legacy"))
+async def callback_legacy_withdrawal_action(callback: CallbackQuery, legacy: re.Match):
+    """Handle withdrawal buttons sent before callback data factories were used"""
+    callback_data = AdminWithdrawalCallback(action=legacy[1], withdrawal_id=int(legacy[2]))
+    await _WITHDRAWAL_ACTIONS[callback_data.action](callback, callback_data)
+
+
 # ==================== PAYOUT CONFIRMATION HANDLERS ====================
 
-@router.callback_query(F.data.startswith("confirm_payout:"))
-async def callback_confirm_payout(callback: CallbackQuery):
+async def callback_confirm_payout(callback: CallbackQuery, callback_data: AdminPayoutCallback):
     """
     Admin manually confirms payout (alternative to automatic invoice payment)
 
     This is used when admin paid winner through alternative method
     (not via the invoice link)
     """
-    if not is_admin(callback.from_user.id):
-        await callback.answer("❌ Только администратор может это сделать!", show_alert=True)
-        return
-
-    # Parse raffle ID from callback data
-    raffle_id = int(callback.data.split(":")[1])
+    raffle_id = callback_data.raffle_id
 
-    async with get_session() as session:
+    # Double clicks wait here and then see the updated payout status
+    async with payout_lock(raffle_id), get_session() as session:
         # Get payout request
         payout = await crud.get_payout_request_by_raffle(session, raffle_id)
 
@@ -945,9 +989,6 @@ async def callback_confirm_payout(callback: CallbackQuery):
 
         # Check if Stars were already credited (via successful_payment)
         # by checking for RAFFLE_WIN transaction
-        from sqlalchemy import select
-        from app.database.models import Transaction, TransactionType
-
         existing_transaction = await session.execute(
             select(Transaction).where(
                 Transaction.user_id == winner.id,
@@ -987,28 +1028,38 @@ async def callback_confirm_payout(callback: CallbackQuery):
                 f"for raffle {raffle_id}"
             )
 
-        # Get admin user for tracking
-        admin_user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
+        # Get admin's internal user ID for tracking
+        admin_user_id = await crud.get_admin_user_id(session, callback.from_user.id)
 
         # Update payout status
         await crud.update_payout_status(
             session,
             payout_id=payout.id,
             status=PayoutStatus.COMPLETED,
-            admin_id=admin_user.id if admin_user else None,
+            admin_id=admin_user_id,
         )
 
+        # expire_on_commit=False: winner keeps the balance set by
+        # update_user_balance, no refresh SELECT needed
         await session.commit()
 
-        # Refresh winner to get updated balance
-        await session.refresh(winner)
-
-        currency_symbol = "⭐" if payout.currency == CurrencyType.STARS else "₽"
-        amount_str = f"{int(payout.amount)}" if payout.currency == CurrencyType.STARS else f"{payout.amount:.2f}"
+        amount_str, currency_symbol = format_prize_amount(payout.amount, payout.currency)
 
-    # Update admin message
     credit_note = "" if already_credited else "\n💫 Stars зачислены на баланс победителя в БД\n"
 
+    # Notify winner in background so the admin reply isn't held up by the DM
+    winner_message = (
+        f"🎉 <b>Поздравляем с победой!</b>\n\n"
+        f"Вам зачислено {amount_str} {currency_symbol} на баланс!\n"
+        f"🏆 Приз за победу в розыгрыше #{raffle_id}\n\n"
+        f"💰 Ваш баланс: {winner.balance_stars if payout.currency == CurrencyType.STARS else winner.balance_rub} {currency_symbol}\n\n"
+        f"Вы можете использовать баланс для участия в новых розыгрышах!\n"
+        f"Используйте команду /balance для просмотра баланса."
+    )
+
+    notification_service = get_notification_service(callback.bot)
+    spawn_background(notification_service.send_to_user(winner.telegram_id, winner_message))
+
     await callback.message.edit_text(
         f"✅ <b>ВЫПЛАТА ПОДТВЕРЖДЕНА</b>\n\n"
         f"🏆 Розыгрыш: #{raffle_id}\n"
@@ -1018,28 +1069,10 @@ async def callback_confirm_payout(callback: CallbackQuery):
         f"{credit_note}\n"
         f"<b>Статус:</b> Оплачено ✅\n"
         f"<b>Время:</b> {payout.completed_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        f"Победитель уведомлен о получении приза.",
-        parse_mode="HTML"
+        f"Победитель уведомлен о получении приза."
     )
     await callback.answer("✅ Выплата подтверждена!")
 
-    # Notify winner
-    winner_message = (
-        f"🎉 <b>Поздравляем с победой!</b>\n\n"
-        f"Вам зачислено {amount_str} {currency_symbol} на баланс!\n"
-        f"🏆 Приз за победу в розыгрыше #{raffle_id}\n\n"
-        f"💰 Ваш баланс: {winner.balance_stars if payout.currency == CurrencyType.STARS else winner.balance_rub} {currency_symbol}\n\n"
-        f"Вы можете использовать баланс для участия в новых розыгрышах!\n"
-        f"Используйте команду /balance для просмотра баланса."
-    )
-
-    from app.services.notification import NotificationService
-    notification_service = NotificationService(callback.bot)
-    await notification_service.send_to_user(
-        winner.telegram_id,
-        winner_message
-    )
-
     logger.info(
         f"Payout confirmed by admin {callback.from_user.id} "
         f"for raffle {raffle_id}, winner {winner.telegram_id}, "
@@ -1047,17 +1080,12 @@ async def callback_confirm_payout(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("reject_payout:"))
-async def callback_reject_payout(callback: CallbackQuery):
+async def callback_reject_payout(callback: CallbackQuery, callback_data: AdminPayoutCallback):
     """Admin rejects payout (requires reason)"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("❌ Только администратор может это сделать!", show_alert=True)
-        return
+    raffle_id = callback_data.raffle_id
 
-    # Parse raffle ID
-    raffle_id = int(callback.data.split(":")[1])
-
-    async with get_session() as session:
+    # Double clicks wait here and then see the updated payout status
+    async with payout_lock(raffle_id), get_session() as session:
         # Get payout request
         payout = await crud.get_payout_request_by_raffle(session, raffle_id)
 
@@ -1069,25 +1097,36 @@ async def callback_reject_payout(callback: CallbackQuery):
             await callback.answer("❌ Эта выплата уже обработана!", show_alert=True)
             return
 
-        # Get admin user
-        admin_user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
+        # Get admin's internal user ID
+        admin_user_id = await crud.get_admin_user_id(session, callback.from_user.id)
 
         # Update status to rejected with default reason
         await crud.update_payout_status(
             session,
             payout_id=payout.id,
             status=PayoutStatus.REJECTED,
-            admin_id=admin_user.id if admin_user else None,
+            admin_id=admin_user_id,
             rejection_reason="Отклонено администратором",
         )
 
         await session.commit()
 
         winner = payout.winner
-        currency_symbol = "⭐" if payout.currency == CurrencyType.STARS else "₽"
-        amount_str = f"{int(payout.amount)}" if payout.currency == CurrencyType.STARS else f"{payout.amount:.2f}"
+        amount_str, currency_symbol = format_prize_amount(payout.amount, payout.currency)
+
+    winner_message = (
+        f"⚠️ <b>Проблема с выплатой приза</b>\n\n"
+        f"Розыгрыш: #{raffle_id}\n"
+        f"Сумма: {amount_str} {currency_symbol}\n\n"
+        f"К сожалению, произошла проблема с выплатой.\n"
+        f"Администратор свяжется с вами в ближайшее время для решения вопроса.\n\n"
+        f"Приносим извинения за неудобства."
+    )
+
+    # Notify winner in background so the admin reply isn't held up by the DM
+    notification_service = get_notification_service(callback.bot)
+    spawn_background(notification_service.send_to_user(winner.telegram_id, winner_message))
 
-    # Update message
     await callback.message.edit_text(
         f"❌ <b>ВЫПЛАТА ОТКЛОНЕНА</b>\n\n"
         f"🏆 Розыгрыш: #{raffle_id}\n"
@@ -1097,31 +1136,30 @@ async def callback_reject_payout(callback: CallbackQuery):
         f"<b>Статус:</b> Отклонено ❌\n"
         f"<b>Причина:</b> Отклонено администратором\n\n"
         f"⚠️ Необходимо повторно обработать этот платеж!",
-        parse_mode="HTML",
-        reply_markup=admin_menu()
+        reply_markup=_ADMIN_MENU_MARKUP
     )
-
     await callback.answer("❌ Выплата отклонена")
 
-    # Notify winner
-    from app.services.notification import NotificationService
-    notification_service = NotificationService(callback.bot)
-
-    winner_message = (
-        f"⚠️ <b>Проблема с выплатой приза</b>\n\n"
-        f"Розыгрыш: #{raffle_id}\n"
-        f"Сумма: {amount_str} {currency_symbol}\n\n"
-        f"К сожалению, произошла проблема с выплатой.\n"
-        f"Администратор свяжется с вами в ближайшее время для решения вопроса.\n\n"
-        f"Приносим извинения за неудобства."
-    )
-
-    await notification_service.send_to_user(
-        winner.telegram_id,
-        winner_message
-    )
-
     logger.warning(
         f"Payout rejected by admin {callback.from_user.id} "
         f"for raffle {raffle_id}, winner {winner.telegram_id}"
     )
+
+
+_PAYOUT_ACTIONS = {
+    "confirm": callback_confirm_payout,
+    "reject": callback_reject_payout,
+}
+
+
+@router.callback_query(AdminPayoutCallback.filter(F.action.in_(_PAYOUT_ACTIONS)))
+async def callback_admin_payout_action(callback: CallbackQuery, callback_data: AdminPayoutCallback):
+    """Dispatch payout confirm/reject with a single filter check"""
+    await _PAYOUT_ACTIONS[callback_data.action](callback, callback_data)
+
+
+@router.callback_query(F.data.regexp(r"^(confirm|reject)_payout:(\d+)$").as_("legacy"))
+async def callback_legacy_payout_action(callback: CallbackQuery, legacy: re.Match):
+    """Handle payout buttons sent before callback data factories were used"""
+    callback_data = AdminPayoutCallback(action=legacy[1], raffle_id=int(legacy[2]))
+    await _PAYOUT_ACTIONS[callback_data.action](callback, callback_data)
@@ -1,37 +1,59 @@
+import html
+import re
+from functools import lru_cache
+from typing import Tuple
+
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, PreCheckoutQuery, LabeledPrice
+from aiogram.types import (
+    Message, CallbackQuery, PreCheckoutQuery, LabeledPrice, InlineKeyboardMarkup
+)
 from aiogram.fsm.context import FSMContext
 from loguru import logger
+from sqlalchemy.exc import IntegrityError
 
 from app.database.session import get_session
 from app.database import crud
-from app.database.models import CurrencyType, TransactionType, TransactionStatus
+from app.database.models import CurrencyType, RaffleStatus, TransactionType, PayoutStatus
 from app.config import settings
 from app.services.payment_service import yookassa_service, PaymentError
 from app.services.ton_service import ton_service
 from app.services.ton_connect_service import ton_connect_service, TonConnectError
+from app.services.notification import get_notification_service
+from app.utils import format_prize_amount, payout_lock, spawn_background
 from app.keyboards.inline import (
-    back_button, ton_payment_keyboard, ton_payment_choice_keyboard, ton_connect_keyboard
+    back_button, ton_payment_keyboard, ton_payment_choice_keyboard, ton_connect_keyboard,
+    TonPaymentCallback,
 )
 
 router = Router()
 
 
+def _parse_payment_payload(payload: str) -> Tuple[str, Tuple[int, ...]]:
+    """
+    Split invoice payload into its kind and integer fields
+
+    "raffle_{raffle_id}" -> ("raffle", (raffle_id,))
+    "payout_{raffle_id}_{winner_telegram_id}" -> ("payout", (raffle_id, winner_telegram_id))
+
+    Raises ValueError if any field is not an integer.
+    """
+    kind, _, rest = payload.partition("_")
+    return kind, tuple(int(field) for field in rest.split("_"))
+
+
 @router.callback_query(F.data == "pay_stars")
 async def callback_pay_stars(callback: CallbackQuery):
     """Handle payment with Telegram Stars"""
     async with get_session() as session:
         # Get current raffle
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
         if not raffle:
             await callback.answer("Нет активного розыгрыша", show_alert=True)
             return
 
         # Check if already participating
         user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
-        participants = await crud.get_raffle_participants(session, raffle.id)
-
-        if user and any(p.user_id == user.id for p in participants):
+        if user and await crud.is_user_in_raffle(session, raffle.id, user.id):
             await callback.answer("Вы уже участвуете в этом розыгрыше!", show_alert=True)
             return
 
@@ -60,72 +82,65 @@ async def callback_pay_rub(callback: CallbackQuery):
         )
         return
 
+    # Validate before contacting YooKassa (read-only, connection released on exit)
     async with get_session() as session:
         # Get current raffle
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
         if not raffle:
             await callback.answer("Нет активного розыгрыша", show_alert=True)
             return
 
         # Check if already participating
         user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
-        participants = await crud.get_raffle_participants(session, raffle.id)
+        if not user:
+            await callback.answer("Ошибка: пользователь не найден", show_alert=True)
+            return
 
-        if user and any(p.user_id == user.id for p in participants):
+        if await crud.is_user_in_raffle(session, raffle.id, user.id):
             await callback.answer("Вы уже участвуете в этом розыгрыше!", show_alert=True)
             return
 
-        # Create transaction
-        transaction = await crud.create_transaction(
+    # Create YooKassa payment without holding a DB connection
+    try:
+        payment_data = await yookassa_service.create_payment(
+            amount=settings.RUB_ENTRY_FEE,
+            description=f"Участие в розыгрыше #{raffle.id}",
+            user_id=user.id,
+        )
+    except PaymentError as e:
+        logger.error(f"Payment creation failed: {e}")
+        await callback.answer(
+            "Ошибка создания платежа. Попробуйте позже.",
+            show_alert=True
+        )
+        return
+
+    # Record transaction only once the payment exists (single INSERT)
+    async with get_session() as session:
+        await crud.create_transaction(
             session,
             user_id=user.id,
             type=TransactionType.RAFFLE_ENTRY,
             amount=settings.RUB_ENTRY_FEE,
             currency=CurrencyType.RUB,
+            payment_id=payment_data["payment_id"],
             description=f"Участие в розыгрыше #{raffle.id}",
             payment_metadata={"raffle_id": raffle.id}
         )
 
-        try:
-            # Create YooKassa payment
-            payment_data = yookassa_service.create_payment(
-                amount=settings.RUB_ENTRY_FEE,
-                description=f"Участие в розыгрыше #{raffle.id}",
-                user_id=user.id,
-            )
-
-            # Update transaction with payment ID
-            transaction.payment_id = payment_data["payment_id"]
-            await session.commit()
-
-            # Send payment link
-            await callback.message.answer(
-                f"💳 <b>Оплата рублями</b>\n\n"
-                f"Сумма: {settings.RUB_ENTRY_FEE} RUB\n\n"
-                f"Нажмите кнопку ниже для оплаты:",
-                reply_markup=back_button(),
-                parse_mode="HTML"
-            )
-
-            # Send payment URL
-            await callback.message.answer(
-                f"🔗 Ссылка для оплаты:\n{payment_data['confirmation_url']}"
-            )
-
-            logger.info(
-                f"Created RUB payment for user {user.telegram_id}, "
-                f"payment_id: {payment_data['payment_id']}"
-            )
+    # Send payment link (single message with clickable URL)
+    await callback.message.answer(
+        f"💳 <b>Оплата рублями</b>\n\n"
+        f"Сумма: {settings.RUB_ENTRY_FEE} RUB\n\n"
+        f"🔗 <a href=\"{html.escape(payment_data['confirmation_url'])}\">Перейти к оплате</a>",
+        reply_markup=back_button(),
+        parse_mode="HTML"
+    )
 
-        except PaymentError as e:
-            logger.error(f"Payment creation failed: {e}")
-            await crud.update_transaction_status(
-                session, transaction.id, TransactionStatus.FAILED
-            )
-            await callback.answer(
-                "Ошибка создания платежа. Попробуйте позже.",
-                show_alert=True
-            )
+    logger.info(
+        "Created RUB payment for user {}, payment_id: {}",
+        user.telegram_id, payment_data["payment_id"]
+    )
 
     await callback.answer()
 
@@ -139,7 +154,7 @@ async def callback_pay_ton(callback: CallbackQuery):
     """
     async with get_session() as session:
         # Get current raffle
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
         if not raffle:
             await callback.answer("Нет активного розыгрыша", show_alert=True)
             return
@@ -164,14 +179,12 @@ async def callback_pay_ton(callback: CallbackQuery):
                 last_name=callback.from_user.last_name,
             )
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-
-        if user and any(p.user_id == user.id for p in participants):
+        # Participation and TON Connect wallet are fetched in one query
+        in_raffle, ton_session = await crud.get_ton_payment_state(session, raffle.id, user.id)
+        if in_raffle:
             await callback.answer("Вы уже участвуете в этом розыгрыше!", show_alert=True)
             return
 
-        # Check if TON Connect wallet is connected
-        ton_session = await crud.get_active_ton_connect_session(session, user.id)
         is_wallet_connected = ton_session is not None
 
         # Get entry fee
@@ -222,14 +235,13 @@ async def callback_pay_ton(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("pay_ton_manual_"))
-async def callback_pay_ton_manual(callback: CallbackQuery):
+async def callback_pay_ton_manual(callback: CallbackQuery, callback_data: TonPaymentCallback):
     """
     Handle manual TON payment (via deep links)
 
     Shows deep links for payment from any TON wallet
     """
-    raffle_id = int(callback.data.split("_")[3])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         # Get raffle
@@ -251,8 +263,7 @@ async def callback_pay_ton_manual(callback: CallbackQuery):
             )
 
         # Check if already participating
-        participants = await crud.get_raffle_participants(session, raffle_id)
-        if any(p.user_id == user.id for p in participants):
+        if await crud.is_user_in_raffle(session, raffle_id, user.id):
             await callback.answer("Вы уже участвуете в этом розыгрыше!", show_alert=True)
             return
 
@@ -267,26 +278,30 @@ async def callback_pay_ton_manual(callback: CallbackQuery):
     )
 
 
-async def show_ton_deep_link_payment(callback: CallbackQuery, raffle, user):
-    """Show TON payment via deep links (fallback method)"""
+@lru_cache(maxsize=1024)
+def _ton_deep_link_payment_view(
+    raffle_id: int, user_id: int, entry_fee: float
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """
+    Render the deep link payment screen for a (raffle, user, fee) triple
+
+    The text and links depend only on these arguments and static settings,
+    so repeated taps by the same user reuse the rendered result.
+    """
     # Generate unique payment comment
     payment_comment = ton_service.generate_payment_comment(
-        raffle_id=raffle.id,
-        user_id=user.id
+        raffle_id=raffle_id,
+        user_id=user_id
     )
 
-    # Get entry fee
-    entry_fee = raffle.entry_fee_amount
-
     # Generate deep links for different wallets
     deep_links = ton_service.generate_payment_deep_link(
         amount_ton=entry_fee,
         comment=payment_comment
     )
 
-    # Send payment instructions with deep link buttons
-    await callback.message.edit_text(
-        f"💎 <b>Оплата участия в розыгрыше #{raffle.id}</b>\n\n"
+    text = (
+        f"💎 <b>Оплата участия в розыгрыше #{raffle_id}</b>\n\n"
         f"<b>Сумма:</b> {entry_fee:.4f} TON\n\n"
         f"🚀 <b>Быстрая оплата:</b>\n"
         f"Выберите ваш кошелек - он откроется автоматически "
@@ -294,21 +309,28 @@ async def show_ton_deep_link_payment(callback: CallbackQuery, raffle, user):
         f"💡 <b>Поддерживаются:</b> Tonkeeper, Telegram Wallet (@wallet), TON Wallet и другие\n\n"
         f"✅ После оплаты бот автоматически зарегистрирует ваше участие "
         f"в течение {settings.TON_TRANSACTION_CHECK_INTERVAL} секунд.\n\n"
-        f"🔄 Используйте кнопку 'Проверить оплату' чтобы узнать статус платежа.",
-        reply_markup=ton_payment_keyboard(
-            tonkeeper_url=deep_links["tonkeeper"],
-            ton_url=deep_links["ton"],
-            universal_url=deep_links.get("universal"),
-            raffle_id=raffle.id
-        ),
-        parse_mode="HTML"
+        f"🔄 Используйте кнопку 'Проверить оплату' чтобы узнать статус платежа."
     )
+    keyboard = ton_payment_keyboard(
+        tonkeeper_url=deep_links["tonkeeper"],
+        ton_url=deep_links["ton"],
+        universal_url=deep_links.get("universal"),
+        raffle_id=raffle_id
+    )
+    return text, keyboard
+
+
+async def show_ton_deep_link_payment(callback: CallbackQuery, raffle, user):
+    """Show TON payment via deep links (fallback method)"""
+    text, keyboard = _ton_deep_link_payment_view(raffle.id, user.id, raffle.entry_fee_amount)
+
+    # Send payment instructions with deep link buttons
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
 
 
-@router.callback_query(F.data.startswith("check_ton_payment_"))
-async def callback_check_ton_payment(callback: CallbackQuery):
+async def callback_check_ton_payment(callback: CallbackQuery, callback_data: TonPaymentCallback):
     """Check TON payment status"""
-    raffle_id = int(callback.data.split("_")[3])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         # Get user
@@ -321,8 +343,7 @@ async def callback_check_ton_payment(callback: CallbackQuery):
             return
 
         # Check if user is already participating
-        participants = await crud.get_raffle_participants(session, raffle_id)
-        if any(p.user_id == user.id for p in participants):
+        if await crud.is_user_in_raffle(session, raffle_id, user.id):
             await callback.answer(
                 "✅ Оплата получена! Вы уже участвуете в розыгрыше!",
                 show_alert=True
@@ -343,10 +364,9 @@ async def callback_check_ton_payment(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("show_manual_ton_payment_"))
-async def callback_show_manual_ton_payment(callback: CallbackQuery):
+async def callback_show_manual_ton_payment(callback: CallbackQuery, callback_data: TonPaymentCallback):
     """Show manual payment details for users who can't use deep links"""
-    raffle_id = int(callback.data.split("_")[4])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         # Get raffle
@@ -411,10 +431,9 @@ async def callback_show_manual_ton_payment(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("pay_ton_connect_"))
-async def callback_pay_ton_connect(callback: CallbackQuery):
+async def callback_pay_ton_connect(callback: CallbackQuery, callback_data: TonPaymentCallback):
     """Handle payment via TON Connect (connected wallet)"""
-    raffle_id = int(callback.data.split("_")[3])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         # Get raffle
@@ -429,8 +448,10 @@ async def callback_pay_ton_connect(callback: CallbackQuery):
             await callback.answer("Ошибка: пользователь не найден", show_alert=True)
             return
 
+        # Wallet and participation are fetched in one query
+        in_raffle, ton_session = await crud.get_ton_payment_state(session, raffle_id, user.id)
+
         # Check if wallet connected
-        ton_session = await crud.get_active_ton_connect_session(session, user.id)
         if not ton_session:
             await callback.answer(
                 "Кошелек не подключен. Используйте ручную оплату.",
@@ -439,8 +460,7 @@ async def callback_pay_ton_connect(callback: CallbackQuery):
             return
 
         # Check if already participating
-        participants = await crud.get_raffle_participants(session, raffle_id)
-        if any(p.user_id == user.id for p in participants):
+        if in_raffle:
             await callback.answer("Вы уже участвуете в этом розыгрыше!", show_alert=True)
             return
 
@@ -503,6 +523,38 @@ async def callback_pay_ton_connect(callback: CallbackQuery):
     await callback.answer()
 
 
+_TON_PAYMENT_ACTIONS = {
+    "manual": callback_pay_ton_manual,
+    "check": callback_check_ton_payment,
+    "details": callback_show_manual_ton_payment,
+    "connect": callback_pay_ton_connect,
+}
+
+@router.callback_query(TonPaymentCallback.filter(F.action.in_(_TON_PAYMENT_ACTIONS)))
+async def callback_ton_payment_action(callback: CallbackQuery, callback_data: TonPaymentCallback):
+    """Dispatch TON payment button actions with a single filter check"""
+    await _TON_PAYMENT_ACTIONS[callback_data.action](callback, callback_data)
+
+
+_LEGACY_TON_PAYMENT_PREFIXES = {
+    "pay_ton_manual": "manual",
+    "check_ton_payment": "check",
+    "show_manual_ton_payment": "details",
+    "pay_ton_connect": "connect",
+}
+
+
+@router.callback_query(
+    F.data.regexp(r"^(pay_ton_manual|check_ton_payment|show_manual_ton_payment|pay_ton_connect)_(\d+)$").as_("legacy")
+)
+async def callback_legacy_ton_payment_action(callback: CallbackQuery, legacy: re.Match):
+    """Handle TON payment buttons sent before callback data factories were used"""
+    callback_data = TonPaymentCallback(
+        action=_LEGACY_TON_PAYMENT_PREFIXES[legacy[1]], raffle_id=int(legacy[2])
+    )
+    await _TON_PAYMENT_ACTIONS[callback_data.action](callback, callback_data)
+
+
 @router.callback_query(F.data.startswith("connect_and_pay_ton"))
 async def callback_connect_and_pay_ton(callback: CallbackQuery, state: FSMContext):
     """Connect TON wallet and then pay"""
@@ -514,7 +566,7 @@ async def callback_connect_and_pay_ton(callback: CallbackQuery, state: FSMContex
 
     async with get_session() as session:
         # Get current active raffle
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
         if not raffle:
             await callback.answer("Нет активного розыгрыша", show_alert=True)
             return
@@ -623,7 +675,7 @@ async def process_pre_checkout_query(pre_checkout_query: PreCheckoutQuery):
     # Always approve for now
     # In production, you might want to do additional validation
     await pre_checkout_query.answer(ok=True)
-    logger.info(f"Pre-checkout approved for user {pre_checkout_query.from_user.id}")
+    logger.info("Pre-checkout approved for user {}", pre_checkout_query.from_user.id)
 
 
 @router.message(F.successful_payment)
@@ -631,25 +683,38 @@ async def process_successful_payment(message: Message):
     """Handle successful Stars payment"""
     payment_info = message.successful_payment
     logger.info(
-        f"Successful payment from user {message.from_user.id}, "
-        f"amount: {payment_info.total_amount}, "
-        f"payload: {payment_info.invoice_payload}"
+        "Successful payment from user {}, amount: {}, payload: {}",
+        message.from_user.id, payment_info.total_amount, payment_info.invoice_payload
     )
 
+    try:
+        kind, fields = _parse_payment_payload(payment_info.invoice_payload)
+    except ValueError:
+        kind, fields = None, ()
+
     # Check if this is an admin payout
-    if payment_info.invoice_payload.startswith("payout_"):
-        await process_admin_payout_payment(message)
+    if kind == "payout":
+        await process_admin_payout_payment(message, fields)
         return
 
     # Extract raffle_id from payload for regular raffle entry
-    try:
-        raffle_id = int(payment_info.invoice_payload.split("_")[1])
-    except (IndexError, ValueError):
+    if not fields:
         logger.error(f"Invalid payload: {payment_info.invoice_payload}")
         await message.answer("Ошибка обработки платежа. Свяжитесь с поддержкой.")
         return
+    raffle_id = fields[0]
 
     async with get_session() as session:
+        # Telegram may redeliver the same payment; process each charge once
+        if await crud.get_transaction_by_payment_id(
+            session, payment_info.telegram_payment_charge_id, TransactionType.RAFFLE_ENTRY
+        ):
+            logger.warning(
+                f"Duplicate payment {payment_info.telegram_payment_charge_id} "
+                f"for raffle {raffle_id}, skipping"
+            )
+            return
+
         # Get or create user
         user = await crud.get_or_create_user(
             session,
@@ -659,63 +724,67 @@ async def process_successful_payment(message: Message):
             last_name=message.from_user.last_name,
         )
 
-        # Create transaction
-        transaction = await crud.create_transaction(
-            session,
-            user_id=user.id,
-            type=TransactionType.RAFFLE_ENTRY,
-            amount=settings.STARS_ENTRY_FEE,
-            currency=CurrencyType.STARS,
-            payment_id=payment_info.telegram_payment_charge_id,
-            description=f"Участие в розыгрыше #{raffle_id}",
-            payment_metadata={"raffle_id": raffle_id}
-        )
+        # Record the charge and join the raffle in one round-trip
+        try:
+            # A concurrent redelivery can pass the check above; the unique
+            # payment index rejects it, and the savepoint keeps the session usable
+            async with session.begin_nested():
+                participant_number, participants_count, min_participants, raffle_status = (
+                    await crud.join_raffle_with_payment(
+                        session,
+                        raffle_id=raffle_id,
+                        user_id=user.id,
+                        amount=settings.STARS_ENTRY_FEE,
+                        currency=CurrencyType.STARS,
+                        payment_id=payment_info.telegram_payment_charge_id,
+                        description=f"Участие в розыгрыше #{raffle_id}",
+                        payment_metadata={"raffle_id": raffle_id},
+                    )
+                )
+        except IntegrityError:
+            logger.warning(
+                f"Duplicate payment {payment_info.telegram_payment_charge_id} "
+                f"for raffle {raffle_id}, skipping"
+            )
+            return
 
-        # Mark transaction as completed
-        await crud.update_transaction_status(
-            session, transaction.id, TransactionStatus.COMPLETED
+    if participant_number is None and raffle_status not in (RaffleStatus.PENDING, RaffleStatus.ACTIVE):
+        # Raffle closed before the payment arrived - transaction stored as failed, refund needed
+        logger.warning(f"Payment from user {user.telegram_id} for closed raffle {raffle_id}")
+        await message.answer(
+            "Розыгрыш уже завершен или отменен. "
+            "Средства будут возвращены автоматически."
         )
+        return
 
-        # Add participant to raffle
-        try:
-            participant = await crud.add_participant(
-                session,
-                raffle_id=raffle_id,
-                user_id=user.id,
-                transaction_id=transaction.id,
-            )
+    if participant_number is None:
+        # Already participating - transaction stored as failed, refund needed
+        logger.warning(f"User {user.telegram_id} already in raffle {raffle_id}")
+        await message.answer(
+            "Вы уже участвуете в этом розыгрыше. "
+            "Средства будут возвращены автоматически."
+        )
+        return
 
-            # Get raffle info
-            raffle = await crud.get_raffle_by_id(session, raffle_id)
-            participants_count = len(await crud.get_raffle_participants(session, raffle_id))
+    await message.answer(
+        f"✅ <b>Оплата успешна!</b>\n\n"
+        f"Вы успешно присоединились к розыгрышу #{raffle_id}\n"
+        f"Ваш номер участника: {participant_number}\n\n"
+        f"Участников: {participants_count}/{min_participants}\n\n"
+        f"Розыгрыш начнется автоматически при достижении минимального количества участников.",
+        parse_mode="HTML"
+    )
 
-            await message.answer(
-                f"✅ <b>Оплата успешна!</b>\n\n"
-                f"Вы успешно присоединились к розыгрышу #{raffle_id}\n"
-                f"Ваш номер участника: {participant.participant_number}\n\n"
-                f"Участников: {participants_count}/{raffle.min_participants}\n\n"
-                f"Розыгрыш начнется автоматически при достижении минимального количества участников.",
-                parse_mode="HTML"
-            )
+    logger.info(
+        "User {} joined raffle {}, participant #{}",
+        user.telegram_id, raffle_id, participant_number
+    )
 
-            logger.info(
-                f"User {user.telegram_id} joined raffle {raffle_id}, "
-                f"participant #{participant.participant_number}"
-            )
 
-        except ValueError as e:
-            # Already participating - refund needed
-            logger.warning(f"User {user.telegram_id} already in raffle {raffle_id}")
-            await crud.update_transaction_status(
-                session, transaction.id, TransactionStatus.FAILED
-            )
-            await message.answer(
-                "Вы уже участвуете в этом розыгрыше. "
-                "Средства будут возвращены автоматически."
-            )
+_PAYOUT_ALREADY_COMPLETED = "ℹ️ Эта выплата уже была зачислена победителю."
 
 
-async def process_admin_payout_payment(message: Message):
+async def process_admin_payout_payment(message: Message, fields: Tuple[int, ...]):
     """
     Handle successful payment from admin for winner payout
 
@@ -726,19 +795,17 @@ async def process_admin_payout_payment(message: Message):
     """
     payment_info = message.successful_payment
 
-    # Parse payload: payout_{raffle_id}_{winner_id}
+    # Payload fields: payout_{raffle_id}_{winner_id}
     try:
-        parts = payment_info.invoice_payload.split("_")
-        raffle_id = int(parts[1])
-        winner_telegram_id = int(parts[2])
+        raffle_id, winner_telegram_id = fields[:2]
         amount = payment_info.total_amount
 
         logger.info(
-            f"Processing admin payout: raffle={raffle_id}, "
-            f"winner={winner_telegram_id}, amount={amount}"
+            "Processing admin payout: raffle={}, winner={}, amount={}",
+            raffle_id, winner_telegram_id, amount
         )
 
-    except (IndexError, ValueError) as e:
+    except ValueError:
         logger.error(f"Invalid payout payload: {payment_info.invoice_payload}")
         await message.answer(
             "❌ Ошибка обработки платежа.\n"
@@ -746,109 +813,100 @@ async def process_admin_payout_payment(message: Message):
         )
         return
 
-    async with get_session() as session:
+    # DB work happens in a short session; Telegram calls run after it is released
+    error_text = None
+    async with payout_lock(raffle_id), get_session() as session:
         try:
-            # Get payout request
-            payout = await crud.get_payout_request_by_raffle(session, raffle_id)
+            # Get payout request, raffle currency, winner and admin in one round-trip
+            payout, raffle_currency, winner, admin_user = await crud.get_payout_context(
+                session, raffle_id, winner_telegram_id, message.from_user.id
+            )
             if not payout:
                 logger.error(f"Payout request not found for raffle {raffle_id}")
-                await message.answer(
-                    "❌ Запрос на выплату не найден."
+                error_text = "❌ Запрос на выплату не найден."
+            elif payout.status == PayoutStatus.COMPLETED:
+                # Redelivered payment: prize was already credited
+                logger.warning(
+                    f"Duplicate payout payment {payment_info.telegram_payment_charge_id} "
+                    f"for raffle {raffle_id}, skipping"
                 )
-                return
-
-            # Get winner user
-            winner = await crud.get_user_by_telegram_id(session, winner_telegram_id)
-            if not winner:
+                error_text = _PAYOUT_ALREADY_COMPLETED
+            elif not winner:
                 logger.error(f"Winner user {winner_telegram_id} not found")
-                await message.answer(
-                    "❌ Пользователь-победитель не найден в базе данных."
+                error_text = "❌ Пользователь-победитель не найден в базе данных."
+            else:
+                currency = raffle_currency or CurrencyType.STARS
+
+                # Credit winner's balance, record transaction and complete payout
+                # in a single statement
+                new_balance = await crud.complete_payout(
+                    session,
+                    payout=payout,
+                    winner=winner,
+                    amount=amount,
+                    currency=currency,
+                    payment_id=payment_info.telegram_payment_charge_id,
+                    payment_metadata={
+                        "raffle_id": raffle_id,
+                        "admin_id": message.from_user.id,
+                        "telegram_charge_id": payment_info.telegram_payment_charge_id,
+                    },
+                    admin_id=admin_user.id if admin_user else None,
                 )
-                return
 
-            # Get raffle info
-            raffle = await crud.get_raffle_by_id(session, raffle_id)
-            currency = raffle.entry_fee_type if raffle else CurrencyType.STARS
+                await session.commit()
 
-            # Credit Stars to winner's balance in DB
-            await crud.update_user_balance(
-                session,
-                user_id=winner.id,
-                amount=amount,
-                currency=currency,
+        except IntegrityError:
+            # A concurrent delivery of the same charge recorded the payout first
+            logger.warning(
+                f"Duplicate payout payment {payment_info.telegram_payment_charge_id} "
+                f"for raffle {raffle_id} rejected by unique index, skipping"
             )
-
-            # Create transaction record
-            await crud.create_transaction(
-                session,
-                user_id=winner.id,
-                type=TransactionType.RAFFLE_WIN,
-                amount=amount,
-                currency=currency,
-                payment_id=payment_info.telegram_payment_charge_id,
-                description=f"Приз за победу в розыгрыше #{raffle_id}",
-                payment_metadata={
-                    "raffle_id": raffle_id,
-                    "admin_id": message.from_user.id,
-                    "telegram_charge_id": payment_info.telegram_payment_charge_id,
-                }
+            await session.rollback()
+            error_text = _PAYOUT_ALREADY_COMPLETED
+        except Exception as e:
+            logger.error(f"Error processing admin payout: {e}", exc_info=True)
+            await session.rollback()
+            error_text = (
+                "❌ <b>Ошибка при обработке выплаты</b>\n\n"
+                "Свяжитесь с технической поддержкой.\n"
+                f"Код ошибки: {str(e)[:100]}"
             )
 
-            # Update payout request status
-            admin_user = await crud.get_user_by_telegram_id(session, message.from_user.id)
-            await crud.update_payout_status(
-                session,
-                payout_id=payout.id,
-                status=crud.PayoutStatus.COMPLETED,
-                admin_id=admin_user.id if admin_user else None,
-            )
+    if error_text:
+        await message.answer(error_text, parse_mode="HTML")
+        return
 
-            await session.commit()
-
-            # Format currency display
-            currency_symbol = "⭐" if currency == CurrencyType.STARS else "₽"
-            amount_str = f"{int(amount)}" if currency == CurrencyType.STARS else f"{amount:.2f}"
-
-            # Notify admin
-            await message.answer(
-                f"✅ <b>Выплата подтверждена!</b>\n\n"
-                f"💫 {amount_str} {currency_symbol} зачислены на баланс победителя\n"
-                f"🏆 Розыгрыш: #{raffle_id}\n"
-                f"👤 Победитель: {winner.first_name}"
-                f"{f' (@{winner.username})' if winner.username else ''}\n"
-                f"📝 ID транзакции: {payment_info.telegram_payment_charge_id}\n\n"
-                f"Победитель может использовать баланс для участия в новых розыгрышах!",
-                parse_mode="HTML"
-            )
+    # Format currency display
+    amount_str, currency_symbol = format_prize_amount(amount, currency)
 
-            # Notify winner
-            winner_message = (
-                f"🎉 <b>Поздравляем с победой!</b>\n\n"
-                f"Вам зачислено {amount_str} {currency_symbol} на баланс!\n"
-                f"🏆 Приз за победу в розыгрыше #{raffle_id}\n\n"
-                f"💰 Ваш баланс: {winner.balance_stars if currency == CurrencyType.STARS else winner.balance_rub} {currency_symbol}\n\n"
-                f"Вы можете использовать баланс для участия в новых розыгрышах!\n"
-                f"Используйте команду /balance для просмотра баланса."
-            )
+    winner_message = (
+        f"🎉 <b>Поздравляем с победой!</b>\n\n"
+        f"Вам зачислено {amount_str} {currency_symbol} на баланс!\n"
+        f"🏆 Приз за победу в розыгрыше #{raffle_id}\n\n"
+        f"💰 Ваш баланс: {new_balance} {currency_symbol}\n\n"
+        f"Вы можете использовать баланс для участия в новых розыгрышах!\n"
+        f"Используйте команду /balance для просмотра баланса."
+    )
 
-            await message.bot.send_message(
-                winner_telegram_id,
-                winner_message,
-                parse_mode="HTML"
-            )
+    # Notify winner in background so the admin reply isn't held up by the DM
+    spawn_background(
+        get_notification_service(message.bot).send_to_user(winner_telegram_id, winner_message)
+    )
 
-            logger.info(
-                f"Admin payout completed: raffle={raffle_id}, "
-                f"winner={winner_telegram_id}, amount={amount}, "
-                f"new_balance={winner.balance_stars if currency == CurrencyType.STARS else winner.balance_rub}"
-            )
+    # Notify admin
+    await message.answer(
+        f"✅ <b>Выплата подтверждена!</b>\n\n"
+        f"💫 {amount_str} {currency_symbol} зачислены на баланс победителя\n"
+        f"🏆 Розыгрыш: #{raffle_id}\n"
+        f"👤 Победитель: {winner.first_name}"
+        f"{f' (@{winner.username})' if winner.username else ''}\n"
+        f"📝 ID транзакции: {payment_info.telegram_payment_charge_id}\n\n"
+        f"Победитель может использовать баланс для участия в новых розыгрышах!",
+        parse_mode="HTML"
+    )
 
-        except Exception as e:
-            logger.error(f"Error processing admin payout: {e}", exc_info=True)
-            await session.rollback()
-            await message.answer(
-                "❌ <b>Ошибка при обработке выплаты</b>\n\n"
-                "Свяжитесь с технической поддержкой.\n"
-                f"Код ошибки: {str(e)[:100]}",
-                parse_mode="HTML"
-            )
+    logger.info(
+        "Admin payout completed: raffle={}, winner={}, amount={}, new_balance={}",
+        raffle_id, winner_telegram_id, amount, new_balance
+    )
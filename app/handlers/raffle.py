@@ -1,3 +1,5 @@
+import re
+
 from aiogram import Router, F, Bot
 from aiogram.types import CallbackQuery, Message
 from aiogram.filters import Command
@@ -7,11 +9,14 @@ from app.database.session import get_session
 from app.database import crud
 from app.database.models import RaffleStatus, CurrencyType, TransactionType, TransactionStatus
 from app.config import settings
-from app.keyboards.inline import payment_choice, raffle_info_keyboard, verification_link_keyboard, back_button
+from app.keyboards.inline import (
+    payment_choice, raffle_info_keyboard, verification_link_keyboard, back_button, RaffleCallback
+)
 from app.services.random_service import random_service, RandomOrgError
-from app.services.notification import NotificationService
+from app.services.notification import get_notification_service
+from app.services.admin_payout_service import get_admin_payout_service
 from app.services.ton_service import ton_service, TonPaymentError
-from app.utils import format_user_display_name, round_rub_amount
+from app.utils import calculate_prize_pool, format_user_display_name
 
 router = Router()
 
@@ -20,7 +25,7 @@ router = Router()
 async def cmd_raffle(message: Message):
     """Handle /raffle command - show current raffle"""
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
 
         if not raffle:
             await message.answer(
@@ -32,8 +37,7 @@ async def cmd_raffle(message: Message):
             )
             return
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-        participants_count = len(participants)
+        participants_count = await crud.count_raffle_participants(session, raffle.id)
 
         # Calculate prize pool with accurate arithmetic
         total_collected = raffle.entry_fee_amount * participants_count
@@ -159,7 +163,7 @@ async def cmd_history(message: Message):
 async def callback_join_raffle(callback: CallbackQuery):
     """Handle join raffle button"""
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
 
         if not raffle:
             await callback.answer(
@@ -170,14 +174,12 @@ async def callback_join_raffle(callback: CallbackQuery):
 
         # Check if user already participating
         user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
-        if user:
-            participants = await crud.get_raffle_participants(session, raffle.id)
-            if any(p.user_id == user.id for p in participants):
-                await callback.answer(
-                    "Вы уже участвуете в этом розыгрыше!",
-                    show_alert=True
-                )
-                return
+        if user and await crud.is_user_in_raffle(session, raffle.id, user.id):
+            await callback.answer(
+                "Вы уже участвуете в этом розыгрыше!",
+                show_alert=True
+            )
+            return
 
         # Show payment options
         await callback.message.edit_text(
@@ -194,10 +196,9 @@ async def callback_join_raffle(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("join_raffle_"))
-async def callback_join_raffle_with_id(callback: CallbackQuery):
+async def callback_join_raffle_with_id(callback: CallbackQuery, callback_data: RaffleCallback):
     """Handle join raffle button with specific raffle ID"""
-    raffle_id = int(callback.data.split("_")[2])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         raffle = await crud.get_raffle_by_id(session, raffle_id)
@@ -218,14 +219,12 @@ async def callback_join_raffle_with_id(callback: CallbackQuery):
 
         # Check if user already participating
         user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
-        if user:
-            participants = await crud.get_raffle_participants(session, raffle.id)
-            if any(p.user_id == user.id for p in participants):
-                await callback.answer(
-                    "Вы уже участвуете в этом розыгрыше!",
-                    show_alert=True
-                )
-                return
+        if user and await crud.is_user_in_raffle(session, raffle.id, user.id):
+            await callback.answer(
+                "Вы уже участвуете в этом розыгрыше!",
+                show_alert=True
+            )
+            return
 
         # Show payment options
         await callback.message.edit_text(
@@ -246,7 +245,7 @@ async def callback_join_raffle_with_id(callback: CallbackQuery):
 async def callback_current_raffle(callback: CallbackQuery):
     """Show current raffle information"""
     async with get_session() as session:
-        raffle = await crud.get_active_raffle(session)
+        raffle = await crud.get_active_raffle_cached(session)
 
         if not raffle:
             await callback.message.edit_text(
@@ -259,8 +258,7 @@ async def callback_current_raffle(callback: CallbackQuery):
             await callback.answer()
             return
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-        participants_count = len(participants)
+        participants_count = await crud.count_raffle_participants(session, raffle.id)
 
         # Calculate prize pool with accurate arithmetic
         total_collected = raffle.entry_fee_amount * participants_count
@@ -320,10 +318,9 @@ async def callback_current_raffle(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("raffle_refresh_"))
-async def callback_raffle_refresh(callback: CallbackQuery):
+async def callback_raffle_refresh(callback: CallbackQuery, callback_data: RaffleCallback):
     """Refresh raffle information"""
-    raffle_id = int(callback.data.split("_")[2])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
         raffle = await crud.get_raffle_by_id(session, raffle_id)
@@ -332,8 +329,7 @@ async def callback_raffle_refresh(callback: CallbackQuery):
             await callback.answer("Розыгрыш не найден!", show_alert=True)
             return
 
-        participants = await crud.get_raffle_participants(session, raffle.id)
-        participants_count = len(participants)
+        participants_count = await crud.count_raffle_participants(session, raffle.id)
 
         # Calculate prize pool with accurate arithmetic
         total_collected = raffle.entry_fee_amount * participants_count
@@ -393,30 +389,32 @@ async def callback_raffle_refresh(callback: CallbackQuery):
     await callback.answer("Обновлено! ✅")
 
 
-@router.callback_query(F.data.startswith("raffle_participants_"))
-async def callback_raffle_participants(callback: CallbackQuery):
+async def callback_raffle_participants(callback: CallbackQuery, callback_data: RaffleCallback):
     """Show raffle participants list"""
-    raffle_id = int(callback.data.split("_")[2])
+    raffle_id = callback_data.raffle_id
 
     async with get_session() as session:
-        participants = await crud.get_raffle_participants(session, raffle_id)
+        # Only the first 20 are shown; the rest are just counted
+        participants = await crud.get_raffle_participants(session, raffle_id, limit=20)
 
         if not participants:
             await callback.answer("Пока нет участников")
             return
 
+        participants_count = await crud.count_raffle_participants(session, raffle_id)
+
         participants_text = f"<b>👥 Участники розыгрыша #{raffle_id}</b>\n\n"
 
         # Get current user for privacy check
         current_user = await crud.get_user_by_telegram_id(session, callback.from_user.id)
         current_user_id = current_user.id if current_user else None
 
-        for p in participants[:20]:  # Limit to first 20
+        for p in participants:
             user_display = format_user_display_name(p.user, current_user_id)
             participants_text += f"{p.participant_number}. {user_display}\n"
 
-        if len(participants) > 20:
-            participants_text += f"\n... и еще {len(participants) - 20} участников"
+        if participants_count > 20:
+            participants_text += f"\n... и еще {participants_count - 20} участников"
 
         await callback.message.edit_text(
             participants_text,
@@ -427,6 +425,37 @@ async def callback_raffle_participants(callback: CallbackQuery):
     await callback.answer()
 
 
+_RAFFLE_ACTIONS = {
+    "join": callback_join_raffle_with_id,
+    "refresh": callback_raffle_refresh,
+    "participants": callback_raffle_participants,
+}
+
+
+@router.callback_query(RaffleCallback.filter(F.action.in_(_RAFFLE_ACTIONS)))
+async def callback_raffle_action(callback: CallbackQuery, callback_data: RaffleCallback):
+    """Dispatch raffle card button actions with a single filter check"""
+    await _RAFFLE_ACTIONS[callback_data.action](callback, callback_data)
+
+
+_LEGACY_RAFFLE_PREFIXES = {
+    "join_raffle": "join",
+    "raffle_refresh": "refresh",
+    "raffle_participants": "participants",
+}
+
+
+@router.callback_query(
+    F.data.regexp(r"^(join_raffle|raffle_refresh|raffle_participants)_(\d+)$").as_("legacy")
+)
+async def callback_legacy_raffle_action(callback: CallbackQuery, legacy: re.Match):
+    """Handle raffle card buttons sent before callback data factories were used"""
+    callback_data = RaffleCallback(
+        action=_LEGACY_RAFFLE_PREFIXES[legacy[1]], raffle_id=int(legacy[2])
+    )
+    await _RAFFLE_ACTIONS[callback_data.action](callback, callback_data)
+
+
 @router.callback_query(F.data == "history")
 async def callback_history(callback: CallbackQuery):
     """Show user participation history"""
@@ -650,18 +679,23 @@ async def handle_ton_payout(bot: Bot, session, raffle_id: int, winner, prize_amo
         )
 
 
-async def execute_raffle(bot: Bot, raffle_id: int):
+async def execute_raffle(bot: Bot, raffle_id: int) -> bool:
     """
     Execute raffle and determine winner
 
-    This function should be called when minimum participants is reached
+    This function should be called when minimum participants is reached.
+    It validates the raffle state itself, so callers don't need to pre-check it.
+
+    Returns:
+        True if the winner was determined, False otherwise
     """
     async with get_session() as session:
-        raffle = await crud.get_raffle_by_id(session, raffle_id)
+        # Claim the raffle row; a concurrent executor holding it gets None here
+        raffle = await crud.get_raffle_by_id(session, raffle_id, for_update=True)
 
         if not raffle or raffle.status != RaffleStatus.PENDING:
-            logger.warning(f"Cannot execute raffle {raffle_id}: invalid status")
-            return
+            logger.warning(f"Cannot execute raffle {raffle_id}: invalid status or already being executed")
+            return False
 
         participants = await crud.get_raffle_participants(session, raffle_id)
 
@@ -670,7 +704,7 @@ async def execute_raffle(bot: Bot, raffle_id: int):
                 f"Cannot execute raffle {raffle_id}: "
                 f"not enough participants ({len(participants)}/{raffle.min_participants})"
             )
-            return
+            return False
 
         logger.info(f"Executing raffle {raffle_id} with {len(participants)} participants")
 
@@ -683,20 +717,10 @@ async def execute_raffle(bot: Bot, raffle_id: int):
             winner_index = random_result["random_number"] - 1  # Convert to 0-based index
             winner_participant = participants[winner_index]
 
-            # Calculate prize with accurate arithmetic
-            total_collected = raffle.entry_fee_amount * len(participants)
-
-            # For stars, use integer arithmetic; for RUB, use proper rounding
-            if raffle.entry_fee_type == CurrencyType.STARS:
-                commission = int(total_collected * raffle.commission_percent / 100)
-                prize_amount = int(total_collected) - commission
-            else:
-                commission = round(total_collected * (raffle.commission_percent / 100), 2)
-                prize_amount = round(total_collected - commission, 2)
-
-            # Round to whole rubles if currency is RUB
-            if raffle.entry_fee_type == CurrencyType.RUB:
-                prize_amount = round_rub_amount(prize_amount)
+            # Calculate prize (shared with the admin raffle card)
+            _, _, prize_amount = calculate_prize_pool(
+                raffle.entry_fee_amount, len(participants), raffle.commission_percent, raffle.entry_fee_type
+            )
 
             # Set winner
             await crud.set_raffle_winner(
@@ -722,9 +746,7 @@ async def execute_raffle(bot: Bot, raffle_id: int):
             else:
                 # STARS/RUB: Send payout request to admin (legacy system)
                 # This allows admin to pay winner via invoice link
-                from app.services.admin_payout_service import create_admin_payout_service
-
-                payout_service = create_admin_payout_service(bot)
+                payout_service = get_admin_payout_service(bot)
 
                 # Get first admin ID from settings
                 admin_ids = settings.get_admin_ids()
@@ -763,7 +785,7 @@ async def execute_raffle(bot: Bot, raffle_id: int):
             )
 
             # Send notifications
-            notification_service = NotificationService(bot)
+            notification_service = get_notification_service(bot)
 
             # Winner message - updated to reflect admin payout system
             currency_name = "⭐" if raffle.entry_fee_type == CurrencyType.STARS else "RUB"
@@ -820,14 +842,17 @@ async def execute_raffle(bot: Bot, raffle_id: int):
                 f"Winner: user_id={winner_participant.user_id}, "
                 f"prize={prize_amount}"
             )
+            return True
 
         except RandomOrgError as e:
             logger.error(f"Random.org error during raffle {raffle_id}: {e}")
             # Rollback raffle status
             await crud.update_raffle_status(session, raffle_id, RaffleStatus.PENDING)
             await session.commit()
+            return False
 
         except Exception as e:
             logger.error(f"Error executing raffle {raffle_id}: {e}", exc_info=True)
             await crud.update_raffle_status(session, raffle_id, RaffleStatus.PENDING)
             await session.commit()
+            return False
@@ -9,6 +9,7 @@ from app.database import crud
 from app.database.models import CurrencyType, WithdrawalStatus
 from app.config import settings
 from app.keyboards.inline import back_button
+from app.services.notification import get_notification_service
 from app.utils import validate_withdrawal_amount, format_currency_amount, round_rub_amount
 
 router = Router()
@@ -359,8 +360,7 @@ async def create_withdrawal_request(
         )
 
         # Notify admin
-        from app.services.notification import NotificationService
-        notification_service = NotificationService(bot)
+        notification_service = get_notification_service(bot)
 
         admin_message = (
             f"🔔 <b>Новая заявка на вывод!</b>\n\n"
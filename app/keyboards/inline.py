@@ -1,9 +1,41 @@
+from functools import lru_cache
+
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from app.config import settings
 import os
 
 
+class AdminWithdrawalCallback(CallbackData, prefix="adm_wd"):
+    """Admin action on a withdrawal request (view / approve / reject)"""
+    action: str
+    withdrawal_id: int
+
+
+class AdminWithdrawalsPage(CallbackData, prefix="adm_wdp"):
+    """Next page of the admin pending withdrawals list (keyset cursor)"""
+    after_id: int
+
+
+class AdminPayoutCallback(CallbackData, prefix="adm_po"):
+    """Admin action on a raffle winner payout (confirm / reject)"""
+    action: str
+    raffle_id: int
+
+
+class RaffleCallback(CallbackData, prefix="raffle"):
+    """User action on a raffle info card (join / participants / refresh)"""
+    action: str
+    raffle_id: int
+
+
+class TonPaymentCallback(CallbackData, prefix="ton_pay"):
+    """User action on a TON raffle payment (connect / manual / check / details)"""
+    action: str
+    raffle_id: int
+
+
 def main_menu() -> InlineKeyboardMarkup:
     """Main menu keyboard"""
     builder = InlineKeyboardBuilder()
@@ -74,8 +106,9 @@ def payment_choice(stars_fee: int = 0, rub_fee: int = 0, ton_fee: float = 0) ->
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def admin_menu() -> InlineKeyboardMarkup:
-    """Admin panel keyboard"""
+    """Admin panel keyboard (static, built once and shared)"""
     builder = InlineKeyboardBuilder()
 
     builder.row(
@@ -102,8 +135,9 @@ def admin_menu() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def confirm_raffle_start() -> InlineKeyboardMarkup:
-    """Confirmation keyboard for starting raffle"""
+    """Confirmation keyboard for starting raffle (static, built once and shared)"""
     builder = InlineKeyboardBuilder()
 
     builder.row(
@@ -130,11 +164,11 @@ def raffle_info_keyboard(raffle_id: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.row(
-        InlineKeyboardButton(text="Участвовать", callback_data=f"join_raffle_{raffle_id}")
+        InlineKeyboardButton(text="Участвовать", callback_data=RaffleCallback(action="join", raffle_id=raffle_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="Участники", callback_data=f"raffle_participants_{raffle_id}"),
-        InlineKeyboardButton(text="Обновить", callback_data=f"raffle_refresh_{raffle_id}")
+        InlineKeyboardButton(text="Участники", callback_data=RaffleCallback(action="participants", raffle_id=raffle_id).pack()),
+        InlineKeyboardButton(text="Обновить", callback_data=RaffleCallback(action="refresh", raffle_id=raffle_id).pack())
     )
     builder.row(
         InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")
@@ -188,11 +222,11 @@ def admin_withdrawal_keyboard(withdrawal_id: int) -> InlineKeyboardMarkup:
     builder.row(
         InlineKeyboardButton(
             text="✅ Одобрить",
-            callback_data=f"admin_approve_withdrawal_{withdrawal_id}"
+            callback_data=AdminWithdrawalCallback(action="approve", withdrawal_id=withdrawal_id).pack()
         ),
         InlineKeyboardButton(
             text="❌ Отклонить",
-            callback_data=f"admin_reject_withdrawal_{withdrawal_id}"
+            callback_data=AdminWithdrawalCallback(action="reject", withdrawal_id=withdrawal_id).pack()
         )
     )
     builder.row(
@@ -251,7 +285,7 @@ def ton_payment_keyboard(
     builder.row(
         InlineKeyboardButton(
             text="🔄 Проверить оплату",
-            callback_data=f"check_ton_payment_{raffle_id}"
+            callback_data=TonPaymentCallback(action="check", raffle_id=raffle_id).pack()
         )
     )
 
@@ -259,7 +293,7 @@ def ton_payment_keyboard(
     builder.row(
         InlineKeyboardButton(
             text="📋 Данные для ручного ввода",
-            callback_data=f"show_manual_ton_payment_{raffle_id}"
+            callback_data=TonPaymentCallback(action="details", raffle_id=raffle_id).pack()
         )
     )
 
@@ -365,13 +399,13 @@ def ton_payment_choice_keyboard(
         builder.row(
             InlineKeyboardButton(
                 text=f"⚡ Оплатить через TON Connect ({entry_fee:.2f} TON)",
-                callback_data=f"pay_ton_connect_{raffle_id}"
+                callback_data=TonPaymentCallback(action="connect", raffle_id=raffle_id).pack()
             )
         )
         builder.row(
             InlineKeyboardButton(
                 text=f"💎 Оплатить вручную (Deep Links)",
-                callback_data=f"pay_ton_manual_{raffle_id}"
+                callback_data=TonPaymentCallback(action="manual", raffle_id=raffle_id).pack()
             )
         )
     else:
@@ -385,7 +419,7 @@ def ton_payment_choice_keyboard(
         builder.row(
             InlineKeyboardButton(
                 text=f"💎 Оплатить без подключения ({entry_fee:.2f} TON)",
-                callback_data=f"pay_ton_manual_{raffle_id}"
+                callback_data=TonPaymentCallback(action="manual", raffle_id=raffle_id).pack()
             )
         )
 
@@ -9,7 +9,7 @@ from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.config import settings
 from app.database.session import engine
-from app.database.init_db import init_database, check_db_health, ensure_enums_updated
+from app.database.init_db import init_database, check_db_health, ensure_enums_updated, ensure_columns_updated
 from app.handlers import start, payment, raffle, admin, withdrawal, ton_connect
 from app.services.ton_monitor import start_ton_monitor
 from app.services.ton_service import ton_service
@@ -38,6 +38,7 @@ async def on_startup(bot: Bot):
             # Even if database exists, ensure enums are up to date (for TON support)
             # This is CRITICAL for adding the 'ton' value to existing databases
             await ensure_enums_updated(engine)
+            await ensure_columns_updated(engine)
 
         # Verify the fix worked
         logger.info("Verifying database is ready...")
@@ -121,6 +122,13 @@ async def on_shutdown(bot: Bot):
     except Exception as e:
         logger.error(f"Error closing TON Connect service: {e}")
 
+    # Close pooled database connections
+    try:
+        await engine.dispose()
+        logger.info("Database connection pool closed")
+    except Exception as e:
+        logger.error(f"Error closing database pool: {e}")
+
     # Notify admins
     admin_ids = settings.get_admin_ids()
     if admin_ids:
@@ -10,6 +10,7 @@ from aiogram.types import LabeledPrice, InlineKeyboardMarkup, InlineKeyboardButt
 from loguru import logger
 
 from app.database import crud
+from app.keyboards.inline import AdminPayoutCallback
 from app.database.session import get_session
 from app.database.models import CurrencyType, PayoutStatus
 
@@ -177,13 +178,13 @@ class AdminPayoutService:
                 [
                     InlineKeyboardButton(
                         text="✅ Подтвердить (если оплатили вручную)",
-                        callback_data=f"confirm_payout:{raffle_id}"
+                        callback_data=AdminPayoutCallback(action="confirm", raffle_id=raffle_id).pack()
                     )
                 ],
                 [
                     InlineKeyboardButton(
                         text="❌ Отклонить выплату",
-                        callback_data=f"reject_payout:{raffle_id}"
+                        callback_data=AdminPayoutCallback(action="reject", raffle_id=raffle_id).pack()
                     )
                 ]
             ])
@@ -294,3 +295,15 @@ class AdminPayoutService:
 def create_admin_payout_service(bot: Bot) -> AdminPayoutService:
     """Factory function to create AdminPayoutService instance"""
     return AdminPayoutService(bot)
+
+
+# Shared instance, recreated only if a different Bot is passed
+_admin_payout_service: Optional[AdminPayoutService] = None
+
+
+def get_admin_payout_service(bot: Bot) -> AdminPayoutService:
+    """Get shared AdminPayoutService instance for the bot"""
+    global _admin_payout_service
+    if _admin_payout_service is None or _admin_payout_service.bot is not bot:
+        _admin_payout_service = create_admin_payout_service(bot)
+    return _admin_payout_service
@@ -139,3 +139,15 @@ class NotificationService:
 
         # Send to all other participants
         return await self.send_to_many(participant_ids, message)
+
+
+# Shared instance, recreated only if a different Bot is passed
+_notification_service: Optional[NotificationService] = None
+
+
+def get_notification_service(bot: Bot) -> NotificationService:
+    """Get shared NotificationService instance for the bot"""
+    global _notification_service
+    if _notification_service is None or _notification_service.bot is not bot:
+        _notification_service = NotificationService(bot)
+    return _notification_service
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional, Dict, Any
 from uuid import uuid4
 
@@ -25,7 +26,7 @@ class YooKassaService:
             self.enabled = False
             logger.warning("YooKassa credentials not provided, RUB payments disabled")
 
-    def create_payment(
+    async def create_payment(
         self,
         amount: float,
         description: str,
@@ -53,7 +54,8 @@ class YooKassaService:
         try:
             idempotence_key = str(uuid4())
 
-            payment = Payment.create({
+            # The SDK is synchronous; run it off the event loop
+            payment = await asyncio.to_thread(Payment.create, {
                 "amount": {
                     "value": f"{amount:.2f}",
                     "currency": "RUB"
@@ -81,7 +83,7 @@ class YooKassaService:
             logger.error(f"Failed to create payment: {e}")
             raise PaymentError(f"Failed to create payment: {e}")
 
-    def check_payment(self, payment_id: str) -> Dict[str, Any]:
+    async def check_payment(self, payment_id: str) -> Dict[str, Any]:
         """
         Check payment status
 
@@ -98,7 +100,7 @@ class YooKassaService:
             raise PaymentError("YooKassa payment service is not configured")
 
         try:
-            payment = Payment.find_one(payment_id)
+            payment = await asyncio.to_thread(Payment.find_one, payment_id)
 
             return {
                 "payment_id": payment.id,
@@ -113,7 +115,7 @@ class YooKassaService:
             logger.error(f"Failed to check payment {payment_id}: {e}")
             raise PaymentError(f"Failed to check payment: {e}")
 
-    def create_payout(
+    async def create_payout(
         self,
         amount: float,
         card_number: Optional[str] = None,
@@ -158,7 +160,7 @@ class YooKassaService:
                     "phone": phone_number
                 }
 
-            payout = Payout.create({
+            payout = await asyncio.to_thread(Payout.create, {
                 "amount": {
                     "value": f"{amount:.2f}",
                     "currency": "RUB"
@@ -179,7 +181,7 @@ class YooKassaService:
             logger.error(f"Failed to create payout: {e}")
             raise PaymentError(f"Failed to create payout: {e}")
 
-    def check_payout(self, payout_id: str) -> Dict[str, Any]:
+    async def check_payout(self, payout_id: str) -> Dict[str, Any]:
         """
         Check payout status
 
@@ -196,7 +198,7 @@ class YooKassaService:
             raise PaymentError("YooKassa payment service is not configured")
 
         try:
-            payout = Payout.find_one(payout_id)
+            payout = await asyncio.to_thread(Payout.find_one, payout_id)
 
             return {
                 "payout_id": payout.id,
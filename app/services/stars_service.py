@@ -196,7 +196,8 @@ class StarsService:
             user_id: Internal user ID
             telegram_id: Telegram user ID
             withdrawal_amount: Total amount of stars to withdraw
-            transactions: List of user's recent star transactions with payment_id
+            transactions: User's recent star payments - Transaction objects or
+                lightweight rows exposing id, payment_id, amount and created_at
 
         Returns:
             Dictionary with:
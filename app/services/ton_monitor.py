@@ -15,9 +15,10 @@ from loguru import logger
 from app.config import settings
 from app.database.session import get_session
 from app.database import crud
-from app.database.models import CurrencyType, TransactionType, TransactionStatus
+from app.database.models import CurrencyType, RaffleStatus, TransactionType
 from app.services.ton_service import ton_service, TonPaymentError
 from app.handlers.raffle import execute_raffle
+from app.utils import spawn_background
 
 
 class TonTransactionMonitor:
@@ -214,8 +215,7 @@ class TonTransactionMonitor:
                     return
 
                 # Check if user already participating
-                participants = await crud.get_raffle_participants(session, raffle_id)
-                if any(p.user_id == user.id for p in participants):
+                if await crud.is_user_in_raffle(session, raffle_id, user.id):
                     logger.warning(
                         f"User {user_id} already participating in raffle {raffle_id}"
                     )
@@ -291,11 +291,11 @@ class TonTransactionMonitor:
                     logger.info(f"Transaction {tx['hash'][:8]}... already processed")
                     return
 
-                # Create transaction record
-                transaction = await crud.create_transaction(
+                # Record the transaction and join the raffle in one round-trip
+                participant_number, participants_count, _, raffle_status = await crud.join_raffle_with_payment(
                     session,
+                    raffle_id=raffle_id,
                     user_id=user.id,
-                    type=TransactionType.RAFFLE_ENTRY,
                     amount=tx["amount"],
                     currency=CurrencyType.TON,
                     payment_id=tx["hash"][:32],  # Truncate for DB field
@@ -306,31 +306,30 @@ class TonTransactionMonitor:
                         "from_address": tx["from_address"],
                         "timestamp": tx["timestamp"].isoformat(),
                         "lt": tx["lt"],
-                    }
-                )
-
-                # Mark transaction as completed
-                await crud.update_transaction_status(
-                    session, transaction.id, TransactionStatus.COMPLETED
-                )
-
-                # Add participant to raffle
-                participant = await crud.add_participant(
-                    session,
-                    raffle_id=raffle_id,
-                    user_id=user.id,
-                    transaction_id=transaction.id,
+                    },
                 )
+                if participant_number is None:
+                    # Raffle closed or user joined concurrently after the checks above
+                    reason = (
+                        "already in raffle"
+                        if raffle_status in (RaffleStatus.PENDING, RaffleStatus.ACTIVE)
+                        else f"paid for {raffle_status.value} raffle"
+                    )
+                    logger.error(
+                        f"User {user.telegram_id} {reason} {raffle_id}, "
+                        f"transaction {tx['hash'][:8]}... recorded as failed, refund manually"
+                    )
+                    return
 
-                # Get updated participant count
-                participants_count = len(await crud.get_raffle_participants(session, raffle_id))
+                # Release the per-raffle join lock before talking to Telegram
+                await session.commit()
 
                 # Notify user
                 await self.bot.send_message(
                     user.telegram_id,
                     f"✅ <b>Оплата подтверждена!</b>\n\n"
                     f"Вы успешно присоединились к розыгрышу #{raffle_id}\n"
-                    f"Ваш номер участника: {participant.participant_number}\n\n"
+                    f"Ваш номер участника: {participant_number}\n\n"
                     f"Получено: {tx['amount']:.4f} TON\n"
                     f"Участников: {participants_count}/{raffle.min_participants}\n\n"
                     f"Розыгрыш начнется автоматически при достижении минимального количества участников.",
@@ -339,7 +338,7 @@ class TonTransactionMonitor:
 
                 logger.info(
                     f"User {user.telegram_id} joined raffle {raffle_id}, "
-                    f"participant #{participant.participant_number} "
+                    f"participant #{participant_number} "
                     f"(tx: {tx['hash'][:8]}...)"
                 )
 
@@ -349,7 +348,7 @@ class TonTransactionMonitor:
                         f"Raffle {raffle_id} reached min participants, executing..."
                     )
                     # Execute raffle in background
-                    asyncio.create_task(execute_raffle(self.bot, raffle_id))
+                    spawn_background(execute_raffle(self.bot, raffle_id))
 
         except Exception as e:
             logger.error(
@@ -1,5 +1,9 @@
 """Utility functions for the bot"""
-from typing import Optional
+import asyncio
+import weakref
+from decimal import Decimal
+from typing import Coroutine, Optional
+from loguru import logger
 from app.config import settings
 from app.database.models import User, CurrencyType
 
@@ -74,6 +78,70 @@ def format_currency_amount(amount: float, currency: CurrencyType) -> str:
         return f"{round_rub_amount(amount)} ₽"
 
 
+def format_prize_amount(amount: float, currency: CurrencyType) -> tuple[str, str]:
+    """
+    Format payout prize amount for display.
+
+    Args:
+        amount: Prize amount
+        currency: Payout currency (STARS or RUB)
+
+    Returns:
+        Tuple of (amount_str, currency_symbol)
+    """
+    if currency == CurrencyType.STARS:
+        return f"{int(amount)}", "⭐"
+    return f"{amount:.2f}", "₽"
+
+
+# Minor units per whole unit: whole stars, kopecks, 1/10000 TON
+_MINOR_UNITS = {
+    CurrencyType.STARS: 1,
+    CurrencyType.RUB: 100,
+    CurrencyType.TON: 10_000,
+}
+
+
+def calculate_prize_pool(
+    entry_fee: float,
+    participants_count: int,
+    commission_percent: float,
+    currency: CurrencyType,
+) -> tuple[float, float, float]:
+    """
+    Calculate raffle totals exactly as the winner is paid.
+
+    Arithmetic runs in integer minor units; RUB prizes are rounded to whole
+    rubles like every RUB payout.
+
+    Args:
+        entry_fee: Entry fee per participant
+        participants_count: Number of participants
+        commission_percent: Commission percent (may be fractional)
+        currency: Entry fee currency
+
+    Returns:
+        Tuple of (total_collected, commission, prize_amount); integers for Stars
+    """
+    scale = _MINOR_UNITS[currency]
+    total = round(entry_fee * scale) * participants_count
+    if float(commission_percent).is_integer():
+        # Whole percent (the usual case): stay in integers
+        commission = total * int(commission_percent) // 100
+    else:
+        # Decimal keeps fractional percents such as 12.5 exact
+        commission = int(total * Decimal(str(commission_percent)) / 100)
+    prize = total - commission
+
+    if currency == CurrencyType.RUB:
+        prize = round_rub_amount(prize / scale) * scale
+        commission = total - prize
+
+    if scale == 1:
+        return total, commission, prize
+    return total / scale, commission / scale, prize / scale
+
+
 def validate_withdrawal_amount(amount: float, currency: CurrencyType) -> tuple[bool, Optional[str]]:
     """
     Validate withdrawal amount against minimum requirements.
@@ -105,3 +173,32 @@ def validate_withdrawal_amount(amount: float, currency: CurrencyType) -> tuple[b
             return False, f"Минимальная сумма для вывода: {min_amount} ₽"
 
     return True, None
+
+
+# Strong references to fire-and-forget tasks so they are not GC'd mid-flight
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    """Drop the finished task and log its failure (nobody awaits it)"""
+    _BACKGROUND_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.opt(exception=task.exception()).error(f"Background task {task.get_name()} failed")
+
+
+def spawn_background(coro: Coroutine) -> asyncio.Task:
+    """Run coroutine in background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_on_background_done)
+    return task
+
+
+# Serializes confirm/reject/payment handling of the same raffle's payout;
+# an entry goes away once no handler holds or waits on its lock
+_payout_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+def payout_lock(raffle_id: int) -> asyncio.Lock:
+    """Get in-process lock guarding payout processing for a raffle"""
+    return _payout_locks.setdefault(raffle_id, asyncio.Lock())